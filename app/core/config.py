@@ -54,7 +54,91 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = Field(None, env="OPENAI_API_KEY")
     ANTHROPIC_API_KEY: Optional[str] = Field(None, env="ANTHROPIC_API_KEY")
     GEMINI_API_KEY: Optional[str] = Field(None, env="GEMINI_API_KEY")
+
+    # ===== LLM Execution =====
+    LLM_PRIMARY_PROVIDER: str = Field("gemini:gemini-2.5-pro-exp-03-25", env="LLM_PRIMARY_PROVIDER")  # provider:model
+    LLM_SECONDARY_PROVIDER: Optional[str] = Field(None, env="LLM_SECONDARY_PROVIDER")  # hedge/failover target
+    LLM_HEDGE_ENABLED: bool = Field(True, env="LLM_HEDGE_ENABLED")
+    LLM_HEDGE_MIN_SAMPLES: int = Field(20, env="LLM_HEDGE_MIN_SAMPLES")  # samples before the primary's p95 is trusted
+    LLM_HEDGE_DEFAULT_DELAY: float = Field(15.0, env="LLM_HEDGE_DEFAULT_DELAY")  # seconds, until then
+    LLM_MAX_OUTPUT_TOKENS: int = Field(8192, env="LLM_MAX_OUTPUT_TOKENS")
+    FAKE_LLM_LATENCY: float = Field(1.0, env="FAKE_LLM_LATENCY")  # seconds to first chunk for the fake provider
+    FAKE_LLM_CHUNK_DELAY: float = Field(0.02, env="FAKE_LLM_CHUNK_DELAY")
+    FAKE_LLM_JITTER: float = Field(0.2, env="FAKE_LLM_JITTER")
+    LLM_MAX_CONCURRENCY: int = Field(8, env="LLM_MAX_CONCURRENCY")  # in-flight LLM calls per process
+    LLM_REQUESTS_PER_MINUTE: int = Field(60, env="LLM_REQUESTS_PER_MINUTE")
+    LLM_TOKENS_PER_MINUTE: int = Field(1_000_000, env="LLM_TOKENS_PER_MINUTE")
+    LLM_MAX_RETRIES: int = Field(4, env="LLM_MAX_RETRIES")
+    LLM_RETRY_BASE_DELAY: float = Field(1.0, env="LLM_RETRY_BASE_DELAY")  # seconds, doubled per retry with jitter
+    LLM_RETRY_MAX_DELAY: float = Field(30.0, env="LLM_RETRY_MAX_DELAY")
+    LLM_BREAKER_FAILURE_THRESHOLD: int = Field(5, env="LLM_BREAKER_FAILURE_THRESHOLD")  # consecutive failed requests (after retries) to open
+    LLM_BREAKER_RESET_TIMEOUT: float = Field(30.0, env="LLM_BREAKER_RESET_TIMEOUT")  # seconds before a probe call
+    DISCONNECT_POLL_INTERVAL: float = Field(1.0, env="DISCONNECT_POLL_INTERVAL")  # seconds
     
+    # ===== Screenshot Analysis =====
+    ANALYZE_MAX_WIDTH: int = Field(1536, env="ANALYZE_MAX_WIDTH")  # screenshots are downscaled to this width
+    ANALYZE_TILE_HEIGHT: int = Field(3072, env="ANALYZE_TILE_HEIGHT")  # taller pages are split into tiles
+    ANALYZE_TILE_OVERLAP: int = Field(256, env="ANALYZE_TILE_OVERLAP")
+    ANALYZE_JPEG_QUALITY: int = Field(85, env="ANALYZE_JPEG_QUALITY")
+    ANALYZE_PASSTHROUGH_MAX_BYTES: int = Field(512 * 1024, env="ANALYZE_PASSTHROUGH_MAX_BYTES")  # larger images are re-encoded even if they fit
+    ANALYZE_SHORTLIST_ENABLED: bool = Field(False, env="ANALYZE_SHORTLIST_ENABLED")  # prompt with top-N relevant blocks only
+    ANALYZE_SHORTLIST_PROVIDER: str = Field("gemini:gemini-2.0-flash", env="ANALYZE_SHORTLIST_PROVIDER")  # cheap first pass
+    ANALYZE_SHORTLIST_TOP_N: int = Field(20, env="ANALYZE_SHORTLIST_TOP_N")
+    ANALYZE_SHORTLIST_TOKEN_BUDGET: int = Field(2000, env="ANALYZE_SHORTLIST_TOKEN_BUDGET")
+    BATCH_ANALYZE_CONCURRENCY: int = Field(4, env="BATCH_ANALYZE_CONCURRENCY")  # concurrent analyses per batch request
+
+    # ===== Page Rendering =====
+    RENDER_MAX_PARALLEL: int = Field(4, env="RENDER_MAX_PARALLEL")  # concurrent block/page renders per request
+    RENDER_SPLIT_THRESHOLD: int = Field(8, env="RENDER_SPLIT_THRESHOLD")  # pages with this many components render in groups
+    RENDER_LATENCY_BUDGET: float = Field(20.0, env="RENDER_LATENCY_BUDGET")  # target seconds per component group
+    RENDER_DEFAULT_CHARS_PER_SEC: float = Field(400.0, env="RENDER_DEFAULT_CHARS_PER_SEC")  # until throughput is observed
+    RENDER_GROUP_RETRIES: int = Field(2, env="RENDER_GROUP_RETRIES")
+
+    # ===== Result Caches =====
+    RENDER_CACHE_SIZE: int = Field(64, env="RENDER_CACHE_SIZE")  # cached global-block renders per project
+    RENDER_CACHE_MAX_PROJECTS: int = Field(32, env="RENDER_CACHE_MAX_PROJECTS")
+    RENDER_CACHE_TTL: int = Field(24 * 60 * 60, env="RENDER_CACHE_TTL")  # seconds
+    ANALYSIS_CACHE_SIZE: int = Field(256, env="ANALYSIS_CACHE_SIZE")  # in-memory entries before tbl_analysis_cache
+
+    # ===== Block Knowledge Base =====
+    BLOCK_KB_CHECK_INTERVAL: float = Field(2.0, env="BLOCK_KB_CHECK_INTERVAL")  # seconds between block_kb.yaml mtime checks
+
+    # ===== Document Conversion =====
+    CONVERSION_POOL_SIZE: int = Field(min(4, os.cpu_count() or 1), env="CONVERSION_POOL_SIZE")  # HTML->DOCX worker processes; 0 = threads
+    CONVERSION_QUEUE_SIZE: int = Field(16, env="CONVERSION_QUEUE_SIZE")  # conversions queued beyond the running ones
+    CONVERSION_QUEUE_TIMEOUT: float = Field(60.0, env="CONVERSION_QUEUE_TIMEOUT")  # seconds to wait for a slot before 503
+
+    # ===== Google Drive Uploads =====
+    DRIVE_API_ENDPOINT: Optional[str] = Field(None, env="DRIVE_API_ENDPOINT")  # e.g. http://127.0.0.1:8765 for app/helper/fake_drive.py
+    DRIVE_HTTP_TIMEOUT: float = Field(60.0, env="DRIVE_HTTP_TIMEOUT")  # seconds per Drive HTTP request
+    DRIVE_UPLOAD_CHUNK_SIZE: int = Field(1024 * 1024, env="DRIVE_UPLOAD_CHUNK_SIZE")  # bytes, multiple of 256 KiB
+    DRIVE_UPLOAD_CONCURRENCY: int = Field(4, env="DRIVE_UPLOAD_CONCURRENCY")
+    DRIVE_UPLOAD_QUEUE_SIZE: int = Field(64, env="DRIVE_UPLOAD_QUEUE_SIZE")
+    DRIVE_UPLOAD_MAX_RETRIES: int = Field(5, env="DRIVE_UPLOAD_MAX_RETRIES")  # consecutive resumes of one chunk
+    DRIVE_UPLOAD_MAX_ATTEMPTS: int = Field(3, env="DRIVE_UPLOAD_MAX_ATTEMPTS")  # whole-upload attempts
+    DRIVE_UPLOAD_RETRY_BASE_DELAY: float = Field(1.0, env="DRIVE_UPLOAD_RETRY_BASE_DELAY")  # seconds, doubled per retry
+    DRIVE_UPLOAD_RETRY_MAX_DELAY: float = Field(30.0, env="DRIVE_UPLOAD_RETRY_MAX_DELAY")
+    FAKE_DRIVE_FAILURE_RATE: float = Field(0.0, env="FAKE_DRIVE_FAILURE_RATE")  # fake Drive: share of chunk PUTs answered with 503
+
+    # ===== Project Export =====
+    EXPORT_MAX_PARALLEL: int = Field(8, env="EXPORT_MAX_PARALLEL")  # pages/global blocks rendered at once per project export
+    EXPORT_MAX_PAGES: int = Field(1000, env="EXPORT_MAX_PAGES")
+
+    # ===== Background Jobs =====
+    JOB_WORKERS: int = Field(2, env="JOB_WORKERS")  # background document-generation workers
+    JOB_QUEUE_SIZE: int = Field(100, env="JOB_QUEUE_SIZE")
+    JOB_MAX_ATTEMPTS: int = Field(3, env="JOB_MAX_ATTEMPTS")  # per stage, transient errors only
+    JOB_RETRY_BACKOFF: float = Field(2.0, env="JOB_RETRY_BACKOFF")  # seconds, doubled per attempt with jitter
+    JOB_RETRY_MAX_DELAY: float = Field(60.0, env="JOB_RETRY_MAX_DELAY")
+    JOB_LEASE_SECONDS: int = Field(120, env="JOB_LEASE_SECONDS")  # a running job not renewed for this long can be re-claimed
+    JOB_SWEEP_INTERVAL: float = Field(30.0, env="JOB_SWEEP_INTERVAL")  # seconds between scans for claimable jobs
+
+    # ===== Image Captioning =====
+    CAPTIONING_BATCH_SIZE: int = Field(8, env="CAPTIONING_BATCH_SIZE")  # images per BLIP forward pass
+    CAPTIONING_WORKERS: int = Field(1, env="CAPTIONING_WORKERS")  # captioning requests run at once (threads)
+    CAPTIONING_QUEUE_SIZE: int = Field(4, env="CAPTIONING_QUEUE_SIZE")  # requests waiting beyond those; more get 503
+    CAPTIONING_TIMEOUT: float = Field(3600.0, env="CAPTIONING_TIMEOUT")  # seconds per request before 504
+
     # ===== Integration Keys =====
     GITHUB_ACCESS_TOKEN: Optional[str] = Field(None, env="GITHUB_ACCESS_TOKEN")
     FIGMA_ACCESS_TOKEN: Optional[str] = Field(None, env="FIGMA_ACCESS_TOKEN")
@@ -70,6 +154,11 @@ class Settings(BaseSettings):
         ["image/jpeg", "image/png", "application/pdf"],
         env="ALLOWED_FILE_TYPES"
     )
+    KEEP_OUTPUT_ARTIFACTS: bool = Field(True, env="KEEP_OUTPUT_ARTIFACTS")  # keep generated HTML/DOCX in the artifact store
+    ARTIFACT_DIR: str = Field("output/artifacts", env="ARTIFACT_DIR")  # content-addressed <sha[:2]>/<sha>.<ext>
+    ARTIFACT_MAX_BYTES: int = Field(1024 * 1024 * 1024, env="ARTIFACT_MAX_BYTES")  # oldest artifacts evicted beyond this
+    ARTIFACT_MAX_AGE: int = Field(7 * 24 * 60 * 60, env="ARTIFACT_MAX_AGE")  # seconds since last stored
+    ARTIFACT_EVICT_INTERVAL: int = Field(600, env="ARTIFACT_EVICT_INTERVAL")  # seconds between eviction sweeps
   
     # ===== Logging Configuration =====
     LOG_LEVEL: str = Field("INFO", env="LOG_LEVEL")  # DEBUG|INFO|WARNING|ERROR|CRITICAL
@@ -0,0 +1,22 @@
+from sqlalchemy.orm import Session
+from app.models.analysis_cache import AnalysisCache
+
+def get_analysis_by_key(db: Session, cache_key: str):
+    return db.query(AnalysisCache).filter(AnalysisCache.cache_key == cache_key).first()
+
+def upsert_analysis(db: Session, cache_key: str, image_sha256: str, prompt_sha256: str, model: str, result: dict):
+    db_entry = get_analysis_by_key(db, cache_key)
+    if db_entry:
+        db_entry.result = result
+    else:
+        db_entry = AnalysisCache(
+            cache_key=cache_key,
+            image_sha256=image_sha256,
+            prompt_sha256=prompt_sha256,
+            model=model,
+            result=result,
+        )
+        db.add(db_entry)
+    db.commit()
+    db.refresh(db_entry)
+    return db_entry
@@ -0,0 +1,33 @@
+from typing import Dict, Iterable
+
+from sqlalchemy.orm import Session
+from app.models.caption_cache import CaptionCache
+
+def get_captions_by_hashes(db: Session, content_hashes: Iterable[str], caption_config_hash: str) -> Dict[str, str]:
+    """content_hash -> caption for images already captioned with this model and generation config."""
+    content_hashes = list(content_hashes)
+    if not content_hashes:
+        return {}
+    rows = (
+        db.query(CaptionCache.content_hash, CaptionCache.caption)
+        .filter(CaptionCache.content_hash.in_(content_hashes), CaptionCache.caption_config_hash == caption_config_hash)
+        .all()
+    )
+    return {content_hash: caption for content_hash, caption in rows}
+
+def store_captions(db: Session, captions: Dict[str, str], caption_model: str, caption_config_hash: str) -> int:
+    """Insert content_hash -> caption entries not cached yet, in one commit. Returns entries added."""
+    existing = get_captions_by_hashes(db, captions, caption_config_hash)
+    added = 0
+    for content_hash, caption in captions.items():
+        if content_hash in existing:
+            continue
+        db.add(CaptionCache(
+            content_hash=content_hash,
+            caption_config_hash=caption_config_hash,
+            caption_model=caption_model,
+            caption=caption,
+        ))
+        added += 1
+    db.commit()
+    return added
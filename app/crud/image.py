@@ -1,3 +1,5 @@
+from typing import Iterable, List, Optional
+
 from sqlalchemy.orm import Session
 from app.models.image import Image
 from app.schemas.image import ImageCreate, ImageUpdate
@@ -8,6 +10,35 @@ def get_image(db: Session, image_id: int):
 def get_images_by_project(db: Session, project_id: int, skip: int = 0, limit: int = 100):
     return db.query(Image).filter(Image.project_id == project_id).offset(skip).limit(limit).all()
 
+def get_images_by_filepaths(db: Session, filepaths: Iterable[str]) -> List[Image]:
+    filepaths = list(filepaths)
+    if not filepaths:
+        return []
+    return db.query(Image).filter(Image.filepath.in_(filepaths)).all()
+
+def save_image_captions(db: Session, captions: List[dict], project_id: Optional[int] = None) -> int:
+    """
+    Write captions to the alt_text of tbl_images rows in one commit. Each entry carries ``filepaths``
+    (the forms the file may be stored under), ``alt_text`` and the ImageCreate fields used to
+    register files that have no row yet when ``project_id`` is given. Returns rows written.
+    """
+    by_path = {}
+    for db_image in get_images_by_filepaths(db, (path for entry in captions for path in entry["filepaths"])):
+        by_path.setdefault(db_image.filepath, []).append(db_image)
+
+    written = 0
+    for entry in captions:
+        rows = [row for path in entry["filepaths"] for row in by_path.get(path, [])]
+        if not rows and project_id is not None:
+            row = Image(**ImageCreate(project_id=project_id, **entry["image"]).dict())
+            db.add(row)
+            rows = [row]
+        for row in rows:
+            row.alt_text = entry["alt_text"][:255]
+            written += 1
+    db.commit()
+    return written
+
 def create_image(db: Session, image: ImageCreate):
     db_image = Image(**image.dict())
     db.add(db_image)
@@ -0,0 +1,64 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from app.models.job import Job
+
+def _claimable(now: datetime):
+    """Queued jobs, and running jobs whose owner stopped renewing its lease."""
+    return or_(
+        Job.status == "queued",
+        and_(Job.status == "running", or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)),
+    )
+
+def get_job(db: Session, job_id: str):
+    return db.query(Job).filter(Job.id == job_id).first()
+
+def get_jobs_by_status(db: Session, statuses: list):
+    return db.query(Job).filter(Job.status.in_(statuses)).order_by(Job.created_at).all()
+
+def get_claimable_jobs(db: Session, now: datetime):
+    return db.query(Job).filter(_claimable(now)).order_by(Job.created_at).all()
+
+def claim_job(db: Session, job_id: str, owner: str, lease_until: datetime, now: datetime) -> bool:
+    """
+    Atomically take a claimable job for ``owner``: a single conditional UPDATE, so when several
+    processes race for the same job exactly one of them sees a row change.
+    """
+    claimed = db.query(Job).filter(Job.id == job_id, _claimable(now)).update(
+        {
+            Job.status: "running",
+            Job.lease_owner: owner,
+            Job.lease_expires_at: lease_until,
+            Job.started_at: now,
+            Job.attempts: Job.attempts + 1,
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return claimed == 1
+
+def renew_lease(db: Session, job_id: str, owner: str, lease_until: datetime) -> bool:
+    """Extend the lease if ``owner`` still holds it; False means the job was taken over."""
+    renewed = db.query(Job).filter(
+        Job.id == job_id, Job.status == "running", Job.lease_owner == owner
+    ).update({Job.lease_expires_at: lease_until}, synchronize_session=False)
+    db.commit()
+    return renewed == 1
+
+def create_job(db: Session, job_type: str, payload: dict):
+    db_job = Job(id=uuid.uuid4().hex, job_type=job_type, status="queued", payload=payload, timings={})
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def update_job(db: Session, job_id: str, **fields):
+    db_job = get_job(db, job_id)
+    if not db_job:
+        return None
+    for field, value in fields.items():
+        setattr(db_job, field, value)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
@@ -8,5 +8,8 @@ def init_db(db: Session):
     from app.models.project import Project
     from app.models.page import Page
     from app.models.image import Image
+    from app.models.analysis_cache import AnalysisCache
+    from app.models.job import Job
+    from app.models.caption_cache import CaptionCache
     
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
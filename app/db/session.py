@@ -10,4 +10,12 @@ engine = create_engine(
     pool_recycle=3600
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def run_in_session(fn, *args, **kwargs):
+    """Call ``fn(db, *args, **kwargs)`` with a session of its own, closed afterwards; for crud calls run off the event loop."""
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
@@ -1,64 +1,152 @@
+from copy import deepcopy
+
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-from docx.shared import Pt
 from docx.enum.table import WD_TABLE_ALIGNMENT
 
+W_P = qn('w:p')
+W_T = qn('w:t')
+W_TC = qn('w:tc')
+W_TR = qn('w:tr')
+W_TCPR = qn('w:tcPr')
+W_PPR = qn('w:pPr')
+W_TCBORDERS = qn('w:tcBorders')
+W_SPACING = qn('w:spacing')
+W_AFTER = qn('w:after')
+
+# Children that must come after tcBorders / spacing (ECMA-376 CT_TcPr / CT_PPr sequences)
+_TCBORDERS_SUCCESSORS = frozenset(qn(tag) for tag in (
+    'w:shd', 'w:noWrap', 'w:tcMar', 'w:textDirection', 'w:tcFitText', 'w:vAlign',
+    'w:hideMark', 'w:headers', 'w:cellIns', 'w:cellDel', 'w:cellMerge', 'w:tcPrChange',
+))
+_SPACING_SUCCESSORS = frozenset(qn(tag) for tag in (
+    'w:ind', 'w:contextualSpacing', 'w:mirrorIndents', 'w:suppressOverlap', 'w:jc',
+    'w:textDirection', 'w:textAlignment', 'w:textboxTightWrap', 'w:outlineLvl', 'w:divId',
+    'w:cnfStyle', 'w:rPr', 'w:sectPr', 'w:pPrChange',
+))
+
+def _insert_before(parent, element, successors):
+    for index, child in enumerate(parent):
+        if child.tag in successors:
+            parent.insert(index, element)
+            return element
+    parent.append(element)
+    return element
+
+def _build_borders_template():
+    """Build the <w:tcBorders> element once; cells get a deepcopy instead of fresh OxmlElements"""
+    borders = OxmlElement('w:tcBorders')
+    for side in ('top', 'left', 'bottom', 'right'):
+        element = OxmlElement(f'w:{side}')
+        element.set(qn('w:val'), 'single')
+        element.set(qn('w:sz'), '4')
+        element.set(qn('w:color'), '000000')
+        borders.append(element)
+    return borders
+
+_BORDERS_TEMPLATE = _build_borders_template()
+
+def _apply_borders(tc):
+    tcPr = tc.get_or_add_tcPr()
+    existing = tcPr.find(W_TCBORDERS)
+    if existing is not None:
+        tcPr.remove(existing)
+    _insert_before(tcPr, deepcopy(_BORDERS_TEMPLATE), _TCBORDERS_SUCCESSORS)
+
+def _set_space_after_zero(pPr):
+    spacing = pPr.find(W_SPACING)
+    if spacing is None:
+        spacing = _insert_before(pPr, OxmlElement('w:spacing'), _SPACING_SUCCESSORS)
+    spacing.set(W_AFTER, '0')
+
 def set_cell_borders(cell):
     """Set borders for a table cell with direct XML manipulation"""
-    tc = cell._tc
-    tcPr = tc.get_or_add_tcPr()
-    
-    borders = {
-        'top': {'val': 'single', 'sz': '4', 'color': '000000'},
-        'left': {'val': 'single', 'sz': '4', 'color': '000000'},
-        'bottom': {'val': 'single', 'sz': '4', 'color': '000000'},
-        'right': {'val': 'single', 'sz': '4', 'color': '000000'}
-    }
-    
-    for border, props in borders.items():
-        element = OxmlElement(f'w:{border}')
-        for attr, value in props.items():
-            element.set(qn(f'w:{attr}'), value)
-        tcPr.append(element)
+    _apply_borders(cell._tc)
+
+def _has_text(tc):
+    """Same test as ``cell.text.strip()`` but straight off the XML of the cell's own paragraphs"""
+    for p in tc.iterchildren(W_P):
+        for t in p.iter(W_T):
+            if t.text and t.text.strip():
+                return True
+    return False
+
+def _in_vertical_merge(tc):
+    # Any cell of a vertical merge (restart or continue) is treated as filled: widening or
+    # absorbing it would give it a different gridSpan from the cells above and below it
+    tcPr = tc.find(W_TCPR)
+    return tcPr is not None and tcPr.vMerge is not None
+
+def _is_blank_paragraph(p):
+    return all(child.tag == W_PPR for child in p)
+
+def _absorb(keep, others, clear=False):
+    """Fold ``others`` into ``keep``: widen its gridSpan, move any non-blank content, drop them"""
+    span = keep.grid_span
+    for tc in others:
+        span += tc.grid_span
+        if not clear:
+            for child in list(tc):
+                if child.tag != W_TCPR and not (child.tag == W_P and _is_blank_paragraph(child)):
+                    keep.append(child)
+        tc.getparent().remove(tc)
+    keep.grid_span = span
+    if clear:
+        for child in list(keep):
+            if child.tag != W_TCPR:
+                keep.remove(child)
+        keep.append(OxmlElement('w:p'))
+
+def _merge_empty_tcs(tr):
+    """Merge leading and trailing runs of empty cells in a <w:tr>; returns the surviving <w:tc>s"""
+    tcs = list(tr.iterchildren(W_TC))
+    if not tcs:
+        return tcs
+    filled = [_has_text(tc) or _in_vertical_merge(tc) for tc in tcs]
+
+    # Case 1: Empty cells before content collapse into a single blank cell
+    first = next((i for i, f in enumerate(filled) if f), None)
+    if first is not None and first > 0:
+        _absorb(tcs[0], tcs[1:first], clear=True)
+        tcs = tcs[:1] + tcs[first:]
+        filled = filled[:1] + filled[first:]
+
+    # Case 2: Empty cells after content are absorbed by the last filled cell; if that cell is
+    # part of a vertical merge it keeps its width and the empty cells collapse into one instead
+    last = next((i for i in range(len(filled) - 1, -1, -1) if filled[i]), None)
+    if last is not None and last < len(tcs) - 1:
+        if _in_vertical_merge(tcs[last]):
+            if len(tcs) - last > 2:
+                _absorb(tcs[last + 1], tcs[last + 2:], clear=True)
+            tcs = tcs[:last + 2]
+        else:
+            _absorb(tcs[last], tcs[last + 1:])
+            tcs = tcs[:last + 1]
+    return tcs
 
 def merge_empty_cells(row):
     """Merge consecutive empty cells in a table row, handling both leading and trailing empty cells"""
-    cells = row.cells
-    if not cells:
-        return
-    
-    # Case 1: Empty cells before content
-    first_content_idx = next((i for i, cell in enumerate(cells) if cell.text.strip()), None)
-    if first_content_idx is not None and first_content_idx > 0:
-        # Merge all empty cells before content into one
-        cells[0].merge(cells[first_content_idx-1])
-        cells[0].text = ""  # Clear any accidental content
-        # Refresh cells list after merge
-        cells = row.cells
-    
-    # Case 2: Empty cells after content
-    if cells:  # Check if we still have cells after potential merge
-        last_content_idx = len(cells) - 1 - next(
-            (i for i, cell in enumerate(reversed(cells)) if cell.text.strip()), 
-            len(cells))
-        if last_content_idx < len(cells) - 1:
-            # Merge all empty cells after content
-            cells[last_content_idx].merge(cells[-1])
+    _merge_empty_tcs(row._tr)
 
 def process_docx_tables(doc):
-    """Process all tables in document for borders and empty cells"""
+    """Process all tables in document for borders and empty cells.
+
+    Works on the table XML in a single pass per row: every <w:tc> is visited exactly once
+    (``row.cells`` repeats merged cells and is O(columns) to rebuild), borders are copied
+    from a prebuilt template and paragraph formatting is set on the <w:pPr> directly.
+    """
+    normal_style_id = doc.part.get_style_id(doc.styles['Normal'], WD_STYLE_TYPE.PARAGRAPH)
     for table in doc.tables:
         table.alignment = WD_TABLE_ALIGNMENT.CENTER
-        
-        for row in table.rows:
-            merge_empty_cells(row)
-            
-            # Apply borders to all cells (including merged ones)
-            for cell in row.cells:
-                set_cell_borders(cell)
-                
+
+        for tr in table._tbl.iterchildren(W_TR):
+            for tc in _merge_empty_tcs(tr):
+                _apply_borders(tc)
+
                 # Set consistent formatting
-                for paragraph in cell.paragraphs:
-                    paragraph.style = doc.styles['Normal']
-                    paragraph.paragraph_format.space_after = Pt(0)
\ No newline at end of file
+                for p in tc.iterchildren(W_P):
+                    pPr = p.get_or_add_pPr()
+                    pPr.style = normal_style_id
+                    _set_space_after_zero(pPr)
@@ -0,0 +1,90 @@
+"""
+Local stand-in for the Drive v3 resumable upload API, for tests and offline development.
+
+    uvicorn app.helper.fake_drive:app --port 8765
+    DRIVE_API_ENDPOINT=http://127.0.0.1:8765 uvicorn app.main:app
+
+Implements just what upload_docx_as_gdoc uses: starting a resumable session, chunked PUTs with
+Content-Range (308 Resume Incomplete + Range), status queries (``bytes */total``) and reading the
+stored file back. FAKE_DRIVE_FAILURE_RATE makes chunk PUTs fail with 503 at random, to exercise
+the resume path.
+"""
+import random
+import re
+import uuid
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from app.core.config import settings
+
+app = FastAPI(title="Fake Google Drive")
+
+_sessions = {}  # upload_id -> {"metadata": dict, "data": bytearray}
+_files = {}  # file_id -> {"metadata": dict, "data": bytes}
+
+_CONTENT_RANGE = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+def _file_resource(request: Request, file_id: str, metadata: dict, size: int) -> dict:
+    base = str(request.base_url).rstrip("/")
+    return {
+        "kind": "drive#file",
+        "id": file_id,
+        "name": metadata.get("name"),
+        "mimeType": metadata.get("mimeType"),
+        "parents": metadata.get("parents", []),
+        "size": str(size),
+        "webViewLink": f"{base}/drive/v3/files/{file_id}",
+    }
+
+
+@app.post("/upload/drive/v3/files")
+async def start_upload(request: Request, uploadType: str):
+    if uploadType != "resumable":
+        raise HTTPException(status_code=400, detail="Only uploadType=resumable is supported")
+    body = await request.body()
+    metadata = await request.json() if body else {}
+    upload_id = uuid.uuid4().hex
+    _sessions[upload_id] = {"metadata": metadata, "data": bytearray()}
+    location = f"{str(request.base_url).rstrip('/')}/upload/drive/v3/files?uploadType=resumable&upload_id={upload_id}"
+    return Response(status_code=200, headers={"Location": location})
+
+
+@app.put("/upload/drive/v3/files")
+async def upload_chunk(request: Request, upload_id: str):
+    session = _sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown upload session")
+    match = _CONTENT_RANGE.fullmatch(request.headers.get("content-range", "").strip())
+    if match is None:
+        raise HTTPException(status_code=400, detail="Missing or malformed Content-Range")
+    start, end, total = match.groups()
+    chunk = await request.body()
+    data = session["data"]
+
+    if start is not None:
+        if random.random() < settings.FAKE_DRIVE_FAILURE_RATE:
+            # Simulated blip: drop the chunk, the client must query status and resend it
+            return Response(status_code=503)
+        start, end = int(start), int(end)
+        if start > len(data) or end - start + 1 != len(chunk):
+            raise HTTPException(status_code=400, detail="Content-Range does not match stored progress")
+        data[start:] = chunk
+
+    if total != "*" and len(data) >= int(total):
+        file_id = uuid.uuid4().hex
+        _files[file_id] = {"metadata": session["metadata"], "data": bytes(data)}
+        del _sessions[upload_id]
+        return _file_resource(request, file_id, session["metadata"], len(data))
+    headers = {"Range": f"bytes=0-{len(data) - 1}"} if data else {}
+    return Response(status_code=308, headers=headers)
+
+
+@app.get("/drive/v3/files/{file_id}")
+async def get_file(request: Request, file_id: str, alt: str = "json"):
+    stored = _files.get(file_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    if alt == "media":
+        return Response(content=stored["data"], media_type="application/octet-stream")
+    return _file_resource(request, file_id, stored["metadata"], len(stored["data"]))
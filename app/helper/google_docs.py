@@ -1,11 +1,33 @@
 #!/usr/bin/env python3
 """
-Standalone upload+convert script
+Google Drive upload+convert helpers.
+
+Credentials are loaded once per process and their access token is reused until it expires; each
+worker thread keeps its own Drive service (httplib2 connections are not thread-safe). Uploads are
+chunked and resumable: a transient failure resumes from the last byte Drive acknowledged instead
+of starting over. Point DRIVE_API_ENDPOINT at app/helper/fake_drive.py to run without Google.
 """
+import io
+import json
+import logging
+import socket
+import threading
+import time
 from pathlib import Path
+
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError, ResumableUploadError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+
+from app.core.config import settings
+from app.helper.retry import backoff_delay
+
+logger = logging.getLogger(__name__)
 
 # ←– Configure these three values:
 FOLDER_ID   = "1xnyoRVIe2edmWvEmBF438a2nEJmk_V5E"
@@ -14,22 +36,92 @@ FOLDER_ID   = "1xnyoRVIe2edmWvEmBF438a2nEJmk_V5E"
 SCOPES     = ["https://www.googleapis.com/auth/drive.file"]
 KEY_FILE   = Path(__file__).with_name("gen-lang-client-0057847649-f4d80fc7ef12.json")
 
-def upload_docx_as_gdoc(docx_path: Path, title: str, folder_id: str = None):
-    creds = service_account.Credentials.from_service_account_file(KEY_FILE, scopes=SCOPES)
-    drive = build("drive", "v3", credentials=creds)
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+GDOC_MIME = "application/vnd.google-apps.document"
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_creds = None
+_creds_lock = threading.Lock()
+_local = threading.local()
+
+
+def _credentials():
+    """Process-wide credentials; google-auth refreshes the cached token only when it expires."""
+    global _creds
+    with _creds_lock:
+        if _creds is None:
+            if settings.DRIVE_API_ENDPOINT:
+                _creds = AnonymousCredentials()
+            else:
+                _creds = service_account.Credentials.from_service_account_file(KEY_FILE, scopes=SCOPES)
+        return _creds
+
+
+def drive_service():
+    """This thread's long-lived Drive v3 client."""
+    service = getattr(_local, "drive", None)
+    if service is None:
+        transport = httplib2.Http(timeout=settings.DRIVE_HTTP_TIMEOUT)
+        # Drive answers unfinished resumable chunks with "308 Resume Incomplete", not a redirect
+        transport.redirect_codes = transport.redirect_codes - {308}
+        http = AuthorizedHttp(_credentials(), http=transport)
+        if settings.DRIVE_API_ENDPOINT:
+            # Rewrite the bundled discovery doc so both API and upload URLs hit the fake endpoint
+            doc = json.loads(get_static_doc("drive", "v3"))
+            doc["rootUrl"] = settings.DRIVE_API_ENDPOINT.rstrip("/") + "/"
+            service = build_from_document(doc, http=http)
+        else:
+            service = build("drive", "v3", http=http, cache_discovery=False)
+        _local.drive = service
+    return service
+
+
+def is_transient(exc: Exception) -> bool:
+    """Retryable Drive failures: 408/429/5xx answers and network errors, never local misconfiguration."""
+    if isinstance(exc, HttpError):
+        return exc.resp.status in RETRYABLE_STATUS
+    if isinstance(exc, ResumableUploadError):
+        return False
+    # Not OSError as a whole: a missing or unreadable KEY_FILE (FileNotFoundError, PermissionError) won't fix itself
+    return isinstance(exc, (socket.timeout, TimeoutError, ConnectionError, httplib2.ServerNotFoundError))
+
 
-    media = MediaFileUpload(
-        str(docx_path),
-        mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    )
+def upload_docx_as_gdoc(docx, title: str, folder_id: str = None):
+    """
+    Upload a DOCX, given as a path or as in-memory bytes, and convert it to a Google Doc.
+    Blocking; returns the document's webViewLink.
+    """
+    if isinstance(docx, (bytes, bytearray)):
+        media = MediaIoBaseUpload(
+            io.BytesIO(docx), mimetype=DOCX_MIME, chunksize=settings.DRIVE_UPLOAD_CHUNK_SIZE, resumable=True
+        )
+    else:
+        media = MediaFileUpload(
+            str(docx), mimetype=DOCX_MIME, chunksize=settings.DRIVE_UPLOAD_CHUNK_SIZE, resumable=True
+        )
     metadata = {
         "name": title,
-        "mimeType": "application/vnd.google-apps.document",
+        "mimeType": GDOC_MIME,
         "parents": [folder_id] if folder_id else []
     }
+    request = drive_service().files().create(body=metadata, media_body=media, fields="id, webViewLink")
 
-    gfile = drive.files().create(
-        body=metadata, media_body=media, fields="id, webViewLink"
-    ).execute()
-    print("Created Google Doc →", gfile["webViewLink"])
+    failures = 0
+    gfile = None
+    while gfile is None:
+        try:
+            _, gfile = request.next_chunk()
+            failures = 0
+        except Exception as e:
+            if not is_transient(e) or failures >= settings.DRIVE_UPLOAD_MAX_RETRIES:
+                raise
+            delay = backoff_delay(
+                failures, settings.DRIVE_UPLOAD_RETRY_BASE_DELAY, settings.DRIVE_UPLOAD_RETRY_MAX_DELAY
+            )
+            failures += 1
+            # The request keeps its resumable session; the next call asks Drive how far it got and continues
+            logger.warning(f"Drive upload of '{title}' interrupted ({e}); resuming in {delay:.1f}s")
+            time.sleep(delay)
+    logger.info(f"Created Google Doc → {gfile['webViewLink']}")
     return gfile["webViewLink"]
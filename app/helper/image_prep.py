@@ -0,0 +1,94 @@
+import io
+import logging
+import mimetypes
+
+from PIL import Image as PILImage
+
+logger = logging.getLogger(__name__)
+
+_FORMAT_MIME = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+    "BMP": "image/bmp",
+}
+
+
+class PreparedImage:
+    """One model-ready image (or tile): encoded bytes, MIME type and where it sits on the page."""
+
+    def __init__(self, data: bytes, mime_type: str, top: int = 0, height: int = 0):
+        self.data = data
+        self.mime_type = mime_type
+        self.top = top
+        self.height = height
+
+
+def detect_mime(data: bytes, filename: str = None) -> str:
+    """
+    Sniff the real format of an image instead of trusting its extension; the extension of
+    ``filename`` is only used when PIL cannot identify the bytes.
+    """
+    try:
+        with PILImage.open(io.BytesIO(data)) as img:
+            mime = _FORMAT_MIME.get(img.format)
+    except Exception:
+        mime = None
+    if mime is None and filename:
+        mime = mimetypes.guess_type(filename)[0]
+    return mime or "application/octet-stream"
+
+
+def _encode(img: PILImage.Image, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def prepare_screenshot(
+    data: bytes,
+    max_width: int,
+    tile_height: int,
+    tile_overlap: int,
+    quality: int = 85,
+    passthrough_max_bytes: int = 0,
+) -> list:
+    """
+    Downscale a screenshot to ``max_width``, re-encode it as JPEG and, if the scaled page is
+    taller than ``tile_height``, cut it into tiles that overlap by ``tile_overlap`` pixels so
+    no section is lost at a seam. Returns one PreparedImage per tile, top to bottom.
+    Images that already fit, need no tiling and are at most ``passthrough_max_bytes`` long
+    are passed through untouched; a large PNG that fits is still re-encoded as JPEG.
+    """
+    with PILImage.open(io.BytesIO(data)) as src:
+        mime = _FORMAT_MIME.get(src.format)
+        width, height = src.size
+        scale = min(1.0, max_width / width) if width else 1.0
+        scaled_height = int(height * scale)
+        if (
+            scale == 1.0
+            and scaled_height <= tile_height
+            and len(data) <= passthrough_max_bytes
+            and mime in ("image/png", "image/jpeg", "image/webp")
+        ):
+            return [PreparedImage(data, mime, 0, height)]
+
+        img = src.convert("RGB")
+        if scale < 1.0:
+            img = img.resize((max(1, int(width * scale)), max(1, scaled_height)), PILImage.LANCZOS)
+
+    if scaled_height <= tile_height:
+        return [PreparedImage(_encode(img, quality), "image/jpeg", 0, scaled_height)]
+
+    step = max(1, tile_height - tile_overlap)
+    tiles = []
+    top = 0
+    while True:
+        bottom = min(top + tile_height, scaled_height)
+        tiles.append(PreparedImage(_encode(img.crop((0, top, img.width, bottom)), quality), "image/jpeg", top, bottom - top))
+        if bottom >= scaled_height:
+            break
+        top += step
+    logger.info(f"Screenshot {width}x{height} prepared as {len(tiles)} tile(s) of <= {tile_height}px")
+    return tiles
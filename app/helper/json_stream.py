@@ -0,0 +1,109 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentStreamParser:
+    """
+    Incrementally scan streamed LLM output for the page JSON and hand back each entry of the
+    top-level ``components`` array as soon as its closing brace arrives.
+
+    Anything before the first ``{`` (code fences, leading prose) is ignored, and braces or
+    quotes inside string values are tracked so they do not confuse the scan. The full text is
+    kept in ``text`` so the caller can still parse the complete document at the end.
+    """
+
+    def __init__(self, array_key: str = "components"):
+        self.array_key = array_key
+        self.page_title = None
+        self.done = False
+        self._buf = []
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_str = False
+        self._esc = False
+        self._str_start = None
+        self._last_key = None
+        self._pending_key = None  # key whose value is being read in the top-level object
+        self._array_depth = None  # stack depth of the components array once entered
+        self._item_start = None
+        self.emitted = 0
+
+    @property
+    def text(self) -> str:
+        if self._buf:
+            self._text += "".join(self._buf)
+            self._buf = []
+        return self._text
+
+    def feed(self, chunk: str) -> list:
+        """Consume the next chunk of text and return the components completed by it."""
+        if not chunk:
+            return []
+        self._buf.append(chunk)
+        buf = self.text
+        completed = []
+        i = self._pos
+        while i < len(buf) and not self.done:
+            c = buf[i]
+            if not self._stack:
+                if c == "{":
+                    self._stack.append(c)
+            elif self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if len(self._stack) == 1:
+                        self._top_level_string(buf[self._str_start:i + 1])
+            elif c == '"':
+                self._in_str = True
+                self._str_start = i
+            elif len(self._stack) == 1 and c == ":":
+                self._pending_key = self._last_key
+            elif len(self._stack) == 1 and c == ",":
+                self._pending_key = self._last_key = None
+            elif c in "{[":
+                if len(self._stack) == 1 and c == "[" and self._pending_key == self.array_key:
+                    self._array_depth = 2
+                elif c == "{" and self._array_depth and len(self._stack) == self._array_depth:
+                    self._item_start = i
+                self._stack.append(c)
+            elif c in "}]":
+                self._stack.pop()
+                if self._array_depth:
+                    if c == "}" and len(self._stack) == self._array_depth and self._item_start is not None:
+                        item = self._parse_item(buf[self._item_start:i + 1])
+                        if item is not None:
+                            completed.append(item)
+                        self._item_start = None
+                    elif len(self._stack) < self._array_depth:
+                        self._array_depth = None
+                if not self._stack:
+                    self.done = True
+            i += 1
+        self._pos = i
+        return completed
+
+    def _top_level_string(self, literal: str) -> None:
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            return
+        if self._pending_key is None:
+            self._last_key = value
+        elif self._pending_key == "page_title":
+            self.page_title = value
+
+    def _parse_item(self, raw: str):
+        try:
+            item = json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"Skipping malformed streamed component #{self.emitted}: {e}")
+            return None
+        self.emitted += 1
+        return item
@@ -1,5 +1,10 @@
+import io
+import subprocess
+
 import pypandoc
 
+from app.helper.doc_format import Document, process_docx_tables
+
 def md_to_docx(md_file, docx_file):
     output = pypandoc.convert_file(md_file, 'docx', outputfile=docx_file)
     print(f"Converted {md_file} to {docx_file}")
@@ -9,6 +14,29 @@ def html_to_docx(html_file, docx_file):
     pypandoc.convert_file(html_file, 'docx', outputfile=docx_file)
     print(f"Converted {html_file} to {docx_file}")
 
+def html_to_docx_bytes(html: str) -> bytes:
+    """Convert an HTML string to DOCX bytes with pandoc over stdin/stdout, without temp files."""
+    result = subprocess.run(
+        [pypandoc.get_pandoc_path(), "--from", "html", "--to", "docx", "--output", "-"],
+        input=html.encode("utf-8"),
+        capture_output=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"pandoc failed ({result.returncode}): {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+def build_docx(html: str) -> bytes:
+    """
+    Convert HTML to DOCX and enhance its table formatting entirely in memory.
+    Top-level and free of app state so it can run in the conversion process pool.
+    """
+    doc = Document(io.BytesIO(html_to_docx_bytes(html)))
+    process_docx_tables(doc)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
 def docx_to_html(docx_file, html_file):
     """Phase 2: convert a DOCX file into a standalone HTML file."""
     pypandoc.convert_file(docx_file, 'html', outputfile=html_file)
@@ -0,0 +1,33 @@
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Jittered exponential backoff: between half and all of ``base_delay * 2**attempt``, capped at ``max_delay``."""
+    cap = min(max_delay, base_delay * 2 ** attempt)
+    return random.uniform(cap / 2, cap)
+
+
+async def retry_async(fn, is_transient, max_attempts: int, base_delay: float, max_delay: float,
+                      label: str = "call", on_retry=None):
+    """
+    Await ``fn()`` up to ``max_attempts`` times, sleeping a jittered backoff between attempts.
+    Only errors for which ``is_transient(exc)`` is true are retried; anything else, or the last
+    failure, propagates. ``on_retry(exc, attempt)`` is called before each retry.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            attempt += 1
+            if attempt >= max_attempts or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt - 1, base_delay, max_delay)
+            if on_retry is not None:
+                on_retry(e, attempt)
+            logger.warning(f"{label} failed ({e}); attempt {attempt + 1}/{max_attempts} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key: the first caller (the leader) starts the work,
+    later callers await the same task and receive its result or exception.
+    The shared task is cancelled only when every waiter has gone away.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._inflight = {}
+
+    def __contains__(self, key):
+        return key in self._inflight
+
+    def _forget(self, key, task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+
+    async def do(self, key, fn):
+        """Run ``fn()`` for ``key`` unless an identical call is already in flight, then share it."""
+        entry = self._inflight.get(key)
+        if entry is None or entry[0].done():
+            # Nothing to join: a finished task would only hand back its stale outcome
+            task = asyncio.ensure_future(fn())
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            logger.info(f"{self.name}: joining in-flight request {str(key)[:12]}")
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not entry[0].done():
+                # Forget the key now rather than in the done-callback, so a caller arriving
+                # before the cancellation lands starts fresh instead of joining a dying task
+                self._forget(key, entry[0])
+                entry[0].cancel()
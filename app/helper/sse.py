@@ -0,0 +1,53 @@
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_pipeline(run, error_message: str = "Request failed"):
+    """
+    Run ``run(progress)`` in a task and yield its progress events as SSE frames as they happen,
+    followed by a ``result`` (or ``error``) frame. A failure is logged with its traceback and the
+    client only gets ``error_message``. If the client goes away the generator is closed and the
+    task is cancelled.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    started = time.monotonic()
+
+    async def progress(event, data):
+        await queue.put((event, data))
+
+    task = asyncio.create_task(run(progress))
+    task.add_done_callback(lambda _: queue.put_nowait(done))
+    try:
+        yield format_sse("stage", {"stage": "started", "elapsed_ms": 0})
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            event, data = item
+            yield format_sse(event, {**data, "elapsed_ms": int((time.monotonic() - started) * 1000)})
+        elapsed_ms = int((time.monotonic() - started) * 1000)
+        if task.cancelled():
+            yield format_sse("error", {"detail": "cancelled", "elapsed_ms": elapsed_ms})
+        elif task.exception() is not None:
+            logger.error(f"{error_message}: {task.exception()}", exc_info=task.exception())
+            yield format_sse("error", {"detail": error_message, "elapsed_ms": elapsed_ms})
+        else:
+            yield format_sse("result", {"payload": task.result(), "elapsed_ms": elapsed_ms})
+    finally:
+        if not task.done():
+            task.cancel()
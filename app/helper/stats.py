@@ -0,0 +1,30 @@
+from collections import deque
+from typing import Optional
+
+
+class RollingWindow:
+    """Rolling window of the last ``size`` duration samples (seconds) with percentile summaries."""
+
+    def __init__(self, size: int = 500):
+        self.samples = deque(maxlen=size)
+        self.total = 0
+
+    def record(self, seconds: float):
+        self.samples.append(max(0.0, seconds))
+        self.total += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def summary(self) -> dict:
+        if not self.samples:
+            return {"count": self.total, "mean": None, "p95": None, "max": None}
+        return {
+            "count": self.total,
+            "mean": round(sum(self.samples) / len(self.samples), 4),
+            "p95": round(self.percentile(95), 4),
+            "max": round(max(self.samples), 4),
+        }
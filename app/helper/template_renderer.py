@@ -0,0 +1,109 @@
+"""
+Local renderer for block templates annotated with slots.
+
+A block in block_kb.yaml opts in with ``render: local`` and marks the values to fill in its
+``html`` with mustache-style tags:
+
+    {{ title }}              HTML-escaped value of properties["title"] (required)
+    {{ subtitle? }}          same, but renders empty when the property is missing
+    {{ @image }}             next sequential "media/image#.jpeg" path
+    {{#items}}...{{/items}}  repeat the body for each entry of a list property; inside,
+                             names resolve against the entry first, then the component
+
+Templates are compiled once into a small node tree and rendered without any LLM call.
+A required slot with no value raises MissingSlot so the caller can fall back to the LLM.
+"""
+import html
+import re
+
+_TAG = re.compile(r"{{\s*([#/]?)\s*(@?[\w.-]+)(\??)\s*}}")
+
+
+class TemplateError(ValueError):
+    """The template markup is malformed (e.g. unbalanced sections)."""
+
+
+class MissingSlot(KeyError):
+    """A required slot has no value in the component properties."""
+
+
+class ImageCounter:
+    """Shared numbering for media/image#.jpeg across every block of one document."""
+
+    def __init__(self, start: int = 1):
+        self.next = start
+
+    def take(self) -> str:
+        path = f"media/image{self.next}.jpeg"
+        self.next += 1
+        return path
+
+
+class CompiledTemplate:
+    def __init__(self, nodes):
+        self._nodes = nodes
+
+    def render(self, properties: dict, images: ImageCounter = None) -> str:
+        out = []
+        _render_nodes(self._nodes, [properties or {}], images or ImageCounter(), out)
+        return "".join(out)
+
+
+def compile_template(source: str) -> CompiledTemplate:
+    """Parse slot-annotated HTML into a reusable CompiledTemplate."""
+    root = []
+    stack = [("", root)]
+    pos = 0
+    for m in _TAG.finditer(source):
+        if m.start() > pos:
+            stack[-1][1].append(("text", source[pos:m.start()]))
+        pos = m.end()
+        kind, name, optional = m.groups()
+        if kind == "#":
+            children = []
+            stack[-1][1].append(("section", name, children))
+            stack.append((name, children))
+        elif kind == "/":
+            if len(stack) == 1 or stack[-1][0] != name:
+                raise TemplateError(f"Unexpected closing tag for section '{name}'")
+            stack.pop()
+        elif name == "@image":
+            stack[-1][1].append(("image",))
+        else:
+            stack[-1][1].append(("var", name, bool(optional)))
+    if len(stack) != 1:
+        raise TemplateError(f"Section '{stack[-1][0]}' is never closed")
+    if pos < len(source):
+        root.append(("text", source[pos:]))
+    return CompiledTemplate(root)
+
+
+def _lookup(scopes, name):
+    for scope in reversed(scopes):
+        if isinstance(scope, dict) and name in scope:
+            return scope[name]
+    return None
+
+
+def _render_nodes(nodes, scopes, images, out):
+    for node in nodes:
+        kind = node[0]
+        if kind == "text":
+            out.append(node[1])
+        elif kind == "image":
+            out.append(images.take())
+        elif kind == "var":
+            _, name, optional = node
+            value = _lookup(scopes, name)
+            if value is None or value == "":
+                if not optional:
+                    raise MissingSlot(name)
+                continue
+            out.append(html.escape(str(value)))
+        elif kind == "section":
+            _, name, children = node
+            value = _lookup(scopes, name)
+            if not value:
+                continue
+            for entry in value if isinstance(value, list) else [value]:
+                _render_nodes(children, scopes + [entry], images, out)
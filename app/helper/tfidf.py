@@ -0,0 +1,37 @@
+import math
+import re
+from collections import Counter
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall((text or "").lower())
+
+
+class TfidfIndex:
+    """Small in-memory TF-IDF index with cosine scoring, for ranking a few hundred short documents."""
+
+    def __init__(self, documents: list):
+        tokenized = [tokenize(doc) for doc in documents]
+        df = Counter(term for tokens in tokenized for term in set(tokens))
+        n = len(documents)
+        self.idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        self.vectors = [self._vector(tokens) for tokens in tokenized]
+
+    def _vector(self, tokens: list) -> dict:
+        counts = Counter(tokens)
+        vec = {term: count * self.idf[term] for term, count in counts.items() if term in self.idf}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {term: w / norm for term, w in vec.items()}
+
+    def search(self, query: str, top_n: int = None) -> list:
+        """Return (document index, score) pairs, best first; documents with no overlap are omitted."""
+        qvec = self._vector(tokenize(query))
+        scores = []
+        for idx, vec in enumerate(self.vectors):
+            score = sum(w * vec.get(term, 0.0) for term, w in qvec.items())
+            if score > 0:
+                scores.append((idx, score))
+        scores.sort(key=lambda pair: (-pair[1], pair[0]))
+        return scores[:top_n] if top_n else scores
@@ -1,13 +1,19 @@
 # app/main.py
+import asyncio
 import logging
-from fastapi import FastAPI, Depends, File, UploadFile, HTTPException
+from fastapi import FastAPI, Depends, File, UploadFile, HTTPException, Request
 from typing import List, Optional, Any
 # from PIL import Image as PILImage # No longer needed here directly for captioning
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from app.schemas.chat_schemas import AnalyzeImage, MappingData, GenerateDocs
-from app.services.chat_service import analyze_image, load_block_kb, map_ui_to_blocks, generate_docs
+from app.schemas.chat_schemas import AnalyzeImage, AnalyzeBatch, MappingData, GenerateDocs
+from app.services.chat_service import analyze_image, analyze_images_batch, load_block_kb, map_ui_to_blocks, generate_docs, llm_router
 from app.schemas.analysis import AnalysisMetadata
+from app.helper.sse import SSE_HEADERS, stream_pipeline
+from app.schemas.job import JobInDB, JobSubmitResponse
+from app.services import artifact_store, conversion_pool, drive_uploader, export_service, job_service
+from app.services.llm_client import CircuitOpenError, is_retryable
 
 from app.api.v1.routers import router
 from app.core.config import settings
@@ -66,6 +72,8 @@ images_static_dir.mkdir(exist_ok=True)
 
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
+ANALYZE_SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
 
 # --- Database Session Setup ---
 # Session = sessionmaker(bind=engine) # Corrected typo: SessionLocal is already configured session
@@ -95,6 +103,49 @@ async def on_startup():
     # Initialize the Hugging Face image captioning model via the service
     await captioning_service.init_captioning_model()
 
+    # Start the HTML->DOCX conversion processes, Drive uploaders and background document-generation workers
+    conversion_pool.start_conversion_pool()
+    await drive_uploader.start_drive_uploader()
+    await asyncio.to_thread(artifact_store.evict_artifacts)
+    await job_service.start_job_workers()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_service.stop_job_workers()
+    await drive_uploader.stop_drive_uploader()
+    conversion_pool.stop_conversion_pool()
+    captioning_service.stop_captioning_executor()
+
+
+async def _cancel_on_disconnect(request: Request, coro):
+    """
+    Run a long LLM-backed coroutine, cancelling it if the HTTP client disconnects first.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}; cancelling work.")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _llm_unavailable(e: Exception) -> Optional[HTTPException]:
+    """Translate provider overload (open circuit, exhausted retries) into a 503 the client can back off on."""
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    if is_retryable(e):
+        return HTTPException(status_code=503, detail="LLM provider is overloaded, try again later",
+                             headers={"Retry-After": str(int(settings.LLM_BREAKER_RESET_TIMEOUT))})
+    return None
+
 
 @app.get("/")
 async def root():
@@ -125,18 +176,79 @@ async def upload_image(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="Image upload failed")
 
 @app.post("/analyze")
-async def analyze(data: AnalyzeImage):
+async def analyze(data: AnalyzeImage, request: Request):
     try:
         # data.img_name should be relative to the static_dir, e.g., "images/myimage.png"
         img_path = static_dir / data.img_name # Use Path object
         if not img_path.exists():
              raise HTTPException(status_code=404, detail=f"Image not found: {data.img_name}")
-        image_data = analyze_image(image_path=str(img_path))
+        image_data = await _cancel_on_disconnect(request, analyze_image(image_path=str(img_path)))
         logger.info(f"Image analyzed: {data.img_name}")
         return image_data
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Image analysis failed for {data.img_name}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Image analysis failed")
+        raise _llm_unavailable(e) or HTTPException(status_code=500, detail="Image analysis failed")
+
+@app.post("/analyze/stream")
+async def analyze_stream(data: AnalyzeImage):
+    """Server-Sent Events variant of /analyze: stage and token events, then the page JSON."""
+    img_path = static_dir / data.img_name
+    if not img_path.exists():
+        raise HTTPException(status_code=404, detail=f"Image not found: {data.img_name}")
+    return StreamingResponse(
+        stream_pipeline(
+            lambda progress: analyze_image(image_path=str(img_path), progress=progress),
+            error_message="Image analysis failed",
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+def _resolve_batch_images(data: AnalyzeBatch) -> dict:
+    """Map each requested image name (relative to static/) to its path, rejecting paths outside static/."""
+    static_root = static_dir.resolve()
+    names = list(data.img_names or [])
+    if data.folder:
+        folder = (static_dir / data.folder).resolve()
+        if not folder.is_relative_to(static_root) or not folder.is_dir():
+            raise HTTPException(status_code=400, detail=f"Invalid folder: {data.folder}")
+        names += sorted(
+            str(p.relative_to(static_root)).replace("\\", "/")
+            for p in folder.iterdir()
+            if p.is_file() and p.suffix.lower() in ANALYZE_SUPPORTED_EXTENSIONS
+        )
+    if not names:
+        raise HTTPException(status_code=400, detail="Provide img_names or a folder containing images.")
+    paths = {}
+    for name in dict.fromkeys(names):
+        img_path = (static_dir / name).resolve()
+        if not img_path.is_relative_to(static_root):
+            raise HTTPException(status_code=400, detail=f"Invalid image path: {name}")
+        if not img_path.exists():
+            raise HTTPException(status_code=404, detail=f"Image not found: {name}")
+        paths[name] = str(img_path)
+    return paths
+
+@app.post("/analyze/batch")
+async def analyze_batch(data: AnalyzeBatch, request: Request):
+    """
+    Analyze several screenshots in one call. Identical images are analyzed once.
+    With ``stream`` set, each image's result is sent as an SSE ``image`` event as soon as it finishes.
+    """
+    image_paths = _resolve_batch_images(data)
+    logger.info(f"Batch analysis requested for {len(image_paths)} image(s)")
+    if data.stream:
+        return StreamingResponse(
+            stream_pipeline(
+                lambda progress: analyze_images_batch(image_paths, progress=progress),
+                error_message="Batch image analysis failed",
+            ),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+    return await _cancel_on_disconnect(request, analyze_images_batch(image_paths))
 
 @app.post("/mapping")
 async def mapping(data: MappingData):
@@ -150,17 +262,125 @@ async def mapping(data: MappingData):
 
 
 @app.post("/generate-doc")
-async def generate(data: GenerateDocs):
+async def generate(data: GenerateDocs, request: Request):
     try:
         img_path = static_dir / data.img_name # Use Path object
         if not img_path.exists():
              raise HTTPException(status_code=404, detail=f"Image not found: {data.img_name}")
-        google_docs_link = await generate_docs(ui_json=data.components_data, mapped=data.mapped_data, image_path=str(img_path))
+        google_docs_link = await _cancel_on_disconnect(
+            request,
+            generate_docs(
+                ui_json=data.components_data,
+                mapped=data.mapped_data,
+                image_path=str(img_path),
+                project_id=data.project_id,
+            ),
+        )
         logger.info(f"Document generated for image: {data.img_name}")
         return google_docs_link
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Document generation failed for {data.img_name}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Document generation failed")
+        raise _llm_unavailable(e) or HTTPException(status_code=500, detail="Document generation failed")
+
+@app.post("/generate-doc/stream")
+async def generate_stream(data: GenerateDocs):
+    """Server-Sent Events variant of /generate-doc: per-block stage events, then the Google Docs link."""
+    img_path = static_dir / data.img_name
+    if not img_path.exists():
+        raise HTTPException(status_code=404, detail=f"Image not found: {data.img_name}")
+    return StreamingResponse(
+        stream_pipeline(lambda progress: generate_docs(
+            ui_json=data.components_data,
+            mapped=data.mapped_data,
+            image_path=str(img_path),
+            project_id=data.project_id,
+            progress=progress,
+        ), error_message="Document generation failed"),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    """Outbound LLM limiter, retry, circuit-breaker, latency and hedging state for this process."""
+    return llm_router.metrics()
+
+@app.get("/metrics/conversion")
+async def conversion_metrics():
+    """HTML->DOCX process-pool occupancy, queue-wait and run-time statistics for this process."""
+    return conversion_pool.metrics()
+
+@app.get("/projects/{project_id}/export")
+async def export_project(project_id: int):
+    """
+    Stream a ZIP of every page of the project (and each distinct global block once) as HTML and
+    DOCX, rendered concurrently. Entries are written as they finish; manifest.json comes last.
+    """
+    pages = await asyncio.to_thread(export_service.load_project_pages, project_id)
+    if pages is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return StreamingResponse(
+        export_service.export_project_zip(project_id, pages),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="project-{project_id}-export.zip"'},
+    )
+
+@app.get("/artifacts/{name}")
+async def get_artifact(name: str, request: Request):
+    """
+    Serve a generated HTML/DOCX by its content-addressed name (<sha256>.<ext>).
+    Content never changes under a name, so the hash is a strong ETag and responses are immutable.
+    """
+    resolved = artifact_store.resolve_artifact(name)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    path, sha256, content_type = resolved
+    etag = f'"{sha256}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=content_type, headers=headers)
+
+@app.get("/metrics/drive")
+async def drive_metrics():
+    """Drive upload queue depth and upload/retry counters for this process."""
+    return drive_uploader.metrics()
+
+# --- Background Jobs ---
+@app.post("/jobs/generate-doc", response_model=JobSubmitResponse, status_code=202)
+async def submit_generate_doc_job(data: GenerateDocs):
+    """Queue /generate-doc work and return immediately with a job id to poll."""
+    img_path = static_dir / data.img_name
+    if not img_path.exists():
+        raise HTTPException(status_code=404, detail=f"Image not found: {data.img_name}")
+    job = await job_service.submit_job("generate-doc", {
+        "image_path": str(img_path),
+        "components_data": data.components_data,
+        "mapped_data": data.mapped_data,
+        "project_id": data.project_id,
+    })
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+@app.get("/jobs/{job_id}", response_model=JobInDB)
+async def read_job(job_id: str):
+    return await job_service.get_job_status(job_id)
+
+@app.get("/jobs/{job_id}/result")
+async def read_job_result(job_id: str):
+    job = await job_service.get_job_status(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error or "Job failed")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.result
+
+@app.post("/jobs/{job_id}/retry", response_model=JobSubmitResponse, status_code=202)
+async def retry_failed_job(job_id: str):
+    job = await job_service.retry_job(job_id)
+    return JobSubmitResponse(job_id=job.id, status=job.status)
 
 # Example Pydantic model for the request, if you change how project_id is passed
 class MetadataRequest(BaseModel):
@@ -199,6 +419,11 @@ async def create_metadata(data: AnalysisMetadata): # Assuming AnalysisMetadata c
 
 
 # --- Image Captioning Endpoint ---
+@app.get("/caption-images/status")
+async def caption_images_status():
+    """Captioning executor state: running and queued requests, capacity and timeout."""
+    return captioning_service.captioning_status()
+
 @app.post("/caption-images/", response_model=CaptionSummaryResponse)
 async def create_captions_for_images_in_folder_endpoint(request: ImageCaptionRequest):
     """
@@ -211,7 +436,8 @@ async def create_captions_for_images_in_folder_endpoint(request: ImageCaptionReq
     try:
         response = await captioning_service.generate_captions_for_images_in_folder(
             folder_path_relative=request.folder_location,
-            base_static_path_abs=str(static_dir.resolve()) # Pass absolute path of static_dir
+            base_static_path_abs=str(static_dir.resolve()), # Pass absolute path of static_dir
+            project_id=request.project_id,
         )
         return response
     except HTTPException as http_exc: # Re-raise HTTPExceptions from the service
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from datetime import datetime
+from app.db.base import Base
+
+class AnalysisCache(Base):
+    __tablename__ = "tbl_analysis_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)  # sha256(image + prompt + model)
+    image_sha256 = Column(String(64), index=True, nullable=False)
+    prompt_sha256 = Column(String(64), nullable=False)
+    model = Column(String(100), nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+from datetime import datetime
+from app.db.base import Base
+
+class CaptionCache(Base):
+    __tablename__ = "tbl_caption_cache"
+    __table_args__ = (UniqueConstraint("content_hash", "caption_config_hash", name="uq_caption_cache_content_config"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), index=True, nullable=False)  # sha256 of the image file bytes
+    caption_config_hash = Column(String(64), nullable=False)  # sha256(model + generation args)
+    caption_model = Column(String(255), nullable=False)
+    caption = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
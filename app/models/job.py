@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON
+from datetime import datetime
+from app.db.base import Base
+
+class Job(Base):
+    __tablename__ = "tbl_jobs"
+
+    id = Column(String(36), primary_key=True, index=True)  # uuid4 hex
+    job_type = Column(String(50), nullable=False)  # e.g., 'generate-doc'
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued|running|succeeded|failed
+    stage = Column(String(100))
+    payload = Column(JSON, nullable=False)
+    result = Column(JSON)
+    error = Column(Text)
+    timings = Column(JSON)
+    checkpoint = Column(JSON)  # output of each finished stage, so a retry resumes where it failed
+    attempts = Column(Integer, default=0, nullable=False)  # times the job has been claimed and run
+    lease_owner = Column(String(100))  # process running the job
+    lease_expires_at = Column(DateTime)  # renewed while running; an expired lease can be re-claimed
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
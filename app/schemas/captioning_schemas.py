@@ -1,9 +1,10 @@
 # app/schemas/captioning_schemas.py
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class ImageCaptionRequest(BaseModel):
     folder_location: str
+    project_id: Optional[int] = None  # create tbl_images rows for captioned files not yet registered
 
 class ImageCaptionResponseItem(BaseModel):
     image_path: str
@@ -15,3 +16,4 @@ class CaptionSummaryResponse(BaseModel):
     results: List[ImageCaptionResponseItem]
     message: str
     errors: List[str] = []
+    reused_captions: int = 0  # images whose caption came from tbl_caption_cache instead of inference
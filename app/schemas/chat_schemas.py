@@ -1,9 +1,15 @@
 from pydantic import BaseModel, Field, validator, ConfigDict
+from typing import Optional
 
 
 class AnalyzeImage(BaseModel):
     img_name:str
 
+class AnalyzeBatch(BaseModel):
+    img_names:Optional[list[str]] = None  # relative to static/, e.g. "images/home.png"
+    folder:Optional[str] = None  # analyze every image directly under static/<folder>
+    stream:bool = False
+
 class MappingData(BaseModel):
     components_data:list[dict]
 
@@ -11,3 +17,4 @@ class GenerateDocs(BaseModel):
     img_name:str
     mapped_data:list[dict]
     components_data:list[dict]
+    project_id:Optional[int] = None
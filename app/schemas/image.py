@@ -23,6 +23,7 @@ class ImageInDB(ImageBase):
     file_size: Optional[int]
     width: Optional[int]
     height: Optional[int]
+    alt_text: Optional[str] = None
     
     class Config:
         orm_mode = True
\ No newline at end of file
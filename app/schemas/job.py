@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobInDB(BaseModel):
+    id: str
+    job_type: str
+    status: str
+    stage: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    timings: Optional[Dict[str, Any]] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,68 @@
+# app/services/analysis_cache.py
+import asyncio
+import copy
+import hashlib
+import logging
+from typing import Optional
+
+from app.core.config import settings
+from app.crud.analysis_cache import get_analysis_by_key, upsert_analysis
+from app.db.session import run_in_session
+from app.helper.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# In-memory front for tbl_analysis_cache; holds the most recently used analyses.
+_memory_cache = LRUCache(maxsize=settings.ANALYSIS_CACHE_SIZE)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def analysis_cache_key(img_bytes: bytes, prompt: str, model: str) -> dict:
+    """
+    Build the content address of an analysis.
+    The prompt embeds the block KB, so editing block_kb.yaml or switching model yields a new key.
+    """
+    image_sha256 = _sha256(img_bytes)
+    prompt_sha256 = _sha256(prompt.encode("utf-8"))
+    cache_key = _sha256(f"{image_sha256}:{prompt_sha256}:{model}".encode("utf-8"))
+    return {
+        "cache_key": cache_key,
+        "image_sha256": image_sha256,
+        "prompt_sha256": prompt_sha256,
+        "model": model,
+    }
+
+
+def _load_from_db(db, cache_key: str) -> Optional[dict]:
+    entry = get_analysis_by_key(db, cache_key)
+    return entry.result if entry else None
+
+
+async def get_cached_analysis(key: dict) -> Optional[dict]:
+    """Return a previous analysis for this key, checking memory first and then the database."""
+    cache_key = key["cache_key"]
+    result = _memory_cache.get(cache_key)
+    if result is None:
+        try:
+            result = await asyncio.to_thread(run_in_session, _load_from_db, cache_key)
+        except Exception as e:
+            logger.warning(f"Analysis cache lookup failed for {cache_key}: {e}")
+            return None
+        if result is None:
+            return None
+        _memory_cache.put(cache_key, result)
+    logger.info(f"Analysis cache hit: {cache_key}")
+    # Callers may mutate the payload; never hand out the cached object itself.
+    return copy.deepcopy(result)
+
+
+async def store_analysis(key: dict, result: dict) -> None:
+    """Record an analysis in memory and persist it; persistence failures are logged, not raised."""
+    _memory_cache.put(key["cache_key"], copy.deepcopy(result))
+    try:
+        await asyncio.to_thread(run_in_session, upsert_analysis, result=result, **key)
+    except Exception as e:
+        logger.warning(f"Failed to persist analysis {key['cache_key']}: {e}")
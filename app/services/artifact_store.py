@@ -0,0 +1,120 @@
+# app/services/artifact_store.py
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    "html": "text/html; charset=utf-8",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+_NAME = re.compile(r"([0-9a-f]{64})\.(html|docx)")
+
+_evict_lock = threading.Lock()
+_last_eviction = 0.0
+
+
+def artifact_path(sha256: str, ext: str) -> str:
+    """output/artifacts/<sha[:2]>/<sha>.<ext>: content-addressed, so identical outputs share one file."""
+    return os.path.join(settings.ARTIFACT_DIR, sha256[:2], f"{sha256}.{ext}")
+
+
+def put_artifact(data: bytes, ext: str) -> dict:
+    """
+    Store ``data`` under its SHA-256 and return its reference. Writes go to a unique temp file and
+    are renamed into place, so concurrent writers of the same content never see a partial file.
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = artifact_path(sha256, ext)
+    if os.path.exists(path):
+        # Already stored: refresh its age so eviction keeps recently produced artifacts
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    maybe_evict()
+    return {
+        "sha256": sha256,
+        "name": f"{sha256}.{ext}",
+        "size": len(data),
+        "url": f"/artifacts/{sha256}.{ext}",
+    }
+
+
+def resolve_artifact(name: str) -> Optional[tuple]:
+    """Map ``<sha256>.<ext>`` to ``(path, sha256, content_type)``, or None if unknown or malformed."""
+    match = _NAME.fullmatch(name)
+    if match is None:
+        return None
+    sha256, ext = match.groups()
+    path = artifact_path(sha256, ext)
+    if not os.path.isfile(path):
+        return None
+    return path, sha256, CONTENT_TYPES[ext]
+
+
+def evict_artifacts() -> dict:
+    """
+    Delete artifacts older than ARTIFACT_MAX_AGE, then the least recently stored ones until the
+    store fits in ARTIFACT_MAX_BYTES. Stale temp files from crashed writers are removed as well.
+    """
+    now = time.time()
+    files, removed, freed = [], 0, 0
+
+    def remove(path, size):
+        nonlocal removed, freed
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        removed, freed = removed + 1, freed + size
+
+    for root, _, names in os.walk(settings.ARTIFACT_DIR):
+        for fname in names:
+            path = os.path.join(root, fname)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            age = now - st.st_mtime
+            if fname.endswith(".tmp"):
+                if age > 3600:
+                    remove(path, st.st_size)
+            elif age > settings.ARTIFACT_MAX_AGE:
+                remove(path, st.st_size)
+            else:
+                files.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= settings.ARTIFACT_MAX_BYTES:
+            break
+        remove(path, size)
+        total -= size
+    if removed:
+        logger.info(f"Evicted {removed} artifact(s), freed {freed} bytes; {total} bytes remain")
+    return {"removed": removed, "freed_bytes": freed, "remaining_bytes": total}
+
+
+def maybe_evict() -> None:
+    """Run evict_artifacts at most once per ARTIFACT_EVICT_INTERVAL seconds."""
+    global _last_eviction
+    if time.time() - _last_eviction < settings.ARTIFACT_EVICT_INTERVAL:
+        return
+    if not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        _last_eviction = time.time()
+        evict_artifacts()
+    finally:
+        _evict_lock.release()
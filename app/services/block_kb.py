@@ -0,0 +1,147 @@
+# app/services/block_kb.py
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import yaml
+
+from app.core.config import settings
+from app.helper.tfidf import TfidfIndex
+from app.helper.template_renderer import CompiledTemplate, TemplateError, compile_template
+
+logger = logging.getLogger(__name__)
+
+KB_PATH = "app/aem_block_kb/block_kb.yaml"
+
+
+class CompiledBlockKB:
+    """
+    Immutable snapshot of block_kb.yaml: blocks indexed by type and by element,
+    the prompt fragments that list them, a TF-IDF index over block descriptions and
+    compiled templates for blocks marked ``render: local``. Built once per file revision.
+    """
+
+    def __init__(self, blocks: List[dict], digest: str):
+        self.blocks = blocks
+        self.digest = digest
+        self.by_type: Dict[str, dict] = {b["type"]: b for b in blocks}
+        self.by_element: Dict[str, List[dict]] = {}
+        for b in blocks:
+            self.by_element.setdefault(b.get("element"), []).append(b)
+        self._lines = [self._render([b]) for b in blocks]
+        self.index = TfidfIndex([f"{b['type']} {b.get('description', '')} {b.get('element', '')}" for b in blocks])
+        self._prompt_fragments: Dict[Optional[str], str] = {None: self._render(blocks)}
+        for element, element_blocks in self.by_element.items():
+            self._prompt_fragments[element] = self._render(element_blocks)
+        self.templates: Dict[str, CompiledTemplate] = {}
+        for b in blocks:
+            if b.get("render") != "local":
+                continue
+            try:
+                self.templates[b["type"]] = compile_template(b["html"])
+            except TemplateError as e:
+                logger.warning(f"Block '{b['type']}' template not usable for local rendering: {e}")
+
+    @staticmethod
+    def _render(blocks: List[dict]) -> str:
+        return "\n\n".join(
+            f"### {b['type']} - {b['description']} ({b['element']})" for b in blocks
+        )
+
+    def prompt_fragment(self, template_type: Optional[str] = None) -> str:
+        """Formatted block list for the analysis prompt, optionally limited to one element type."""
+        return self._prompt_fragments.get(template_type, "")
+
+    def shortlist_fragment(self, query: str, top_n: int, token_budget: int) -> str:
+        """
+        Prompt fragment listing only the blocks most relevant to ``query``, best first,
+        capped at ``top_n`` blocks and roughly ``token_budget`` tokens (~4 chars per token).
+        Falls back to the full list when nothing in the KB matches the query.
+        """
+        picked, used = [], 0
+        for idx, _ in self.index.search(query, top_n):
+            cost = len(self._lines[idx]) // 4 + 1
+            if picked and used + cost > token_budget:
+                break
+            picked.append(self._lines[idx])
+            used += cost
+        return "\n\n".join(picked) if picked else self.prompt_fragment()
+
+
+class BlockKBStore:
+    """
+    Process-wide holder of the compiled KB for one YAML file.
+    Readers always get the current snapshot; when the file's mtime or size changes a
+    background thread recompiles it and swaps the snapshot in, so requests never wait on YAML.
+    """
+
+    def __init__(self, path: str = KB_PATH, check_interval: float = settings.BLOCK_KB_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._kb: Optional[CompiledBlockKB] = None
+        self._signature = None
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def _stat_signature(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _reload(self) -> None:
+        signature = self._stat_signature()
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if self._kb is not None and self._kb.digest == digest:
+            # Touched but unchanged; keep the existing snapshot
+            self._signature = signature
+            return
+        kb = yaml.safe_load(raw)
+        self._kb = CompiledBlockKB(kb["blocks"], digest)
+        self._signature = signature
+        logger.info(f"Block KB compiled from {self.path}: {len(self._kb.blocks)} blocks ({digest[:12]})")
+
+    def _reload_in_background(self) -> None:
+        try:
+            self._reload()
+        except Exception as e:
+            logger.error(f"Block KB reload failed, keeping previous snapshot: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def get(self) -> CompiledBlockKB:
+        kb = self._kb
+        if kb is None:
+            # First load has nothing to fall back on, so it is done inline
+            with self._reload_lock:
+                if self._kb is None:
+                    self._reload()
+            return self._kb
+
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                changed = self._stat_signature() != self._signature
+            except OSError as e:
+                logger.warning(f"Could not stat block KB {self.path}: {e}")
+                changed = False
+            if changed and self._reload_lock.acquire(blocking=False):
+                threading.Thread(target=self._reload_in_background, daemon=True).start()
+        return kb
+
+
+_stores: Dict[str, BlockKBStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_block_kb(path: str = KB_PATH) -> CompiledBlockKB:
+    """Return the compiled KB for ``path``, loading it on first use."""
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(path, BlockKBStore(path))
+    return store.get()
@@ -1,12 +1,22 @@
 # app/services/captioning_service.py
 import os
+import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 
 from PIL import Image as PILImage # Alias to avoid conflict if Image model is imported
 from fastapi import HTTPException
 from transformers import pipeline
 
+from app.core.config import settings
+from app.crud.caption_cache import get_captions_by_hashes, store_captions
+from app.crud.image import save_image_captions
+from app.db.session import run_in_session
 from app.schemas.captioning_schemas import ImageCaptionResponseItem, CaptionSummaryResponse # Import from new location
 
 # --- Configuration ---
@@ -19,11 +29,24 @@ CAPTIONING_GENERATION_ARGS = {
     "repetition_penalty": 1.2,
 }
 
+# Identifies the model + generation settings behind a stored caption; changing either re-captions
+CAPTIONING_CONFIG_HASH = hashlib.sha256(
+    json.dumps({"model": CAPTIONING_MODEL_NAME, "generate_kwargs": CAPTIONING_GENERATION_ARGS}, sort_keys=True).encode("utf-8")
+).hexdigest()
+
 logger = logging.getLogger(__name__)
 
 # --- Module-level Variable for the Hugging Face Model ---
 _captioner: Optional[Any] = None
 
+# --- Captioning executor: inference runs on these threads, never on the event loop ---
+# Threads rather than processes: the pipeline is loaded once in this process, and PIL decoding and
+# torch inference release the GIL, so the API keeps serving while a folder is captioned.
+_executor: Optional[ThreadPoolExecutor] = None
+_state_lock = threading.Lock()
+_admitted = 0  # requests accepted and not yet finished (queued + running)
+_running = 0
+
 async def init_captioning_model():
     """
     Initializes the Hugging Face image captioning model.
@@ -58,9 +81,206 @@ def get_captioner():
         raise HTTPException(status_code=503, detail="Captioning service is unavailable. Model not loaded.")
     return _captioner
 
+def _file_info(path: str) -> Optional[Dict[str, Any]]:
+    """Content hash plus the tbl_images fields for one file, or None if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    width = height = None
+    try:
+        with PILImage.open(path) as img:
+            width, height = img.size
+    except Exception:
+        pass
+    return {
+        "content_hash": hashlib.sha256(data).hexdigest(),
+        "image": {
+            "content_type": mimetypes.guess_type(path)[0] or "application/octet-stream",
+            "file_size": len(data),
+            "width": width,
+            "height": height,
+        },
+    }
+
+async def _best_effort_db(fallback, fn, *args):
+    """Run a crud call off the event loop. Caption persistence is best effort: a DB outage only
+    disables the cache and the write-back, captions are still returned; ``fallback`` is returned instead."""
+    try:
+        return await asyncio.to_thread(run_in_session, fn, *args)
+    except Exception as e:
+        logger.error(f"Caption store unavailable ({getattr(fn, '__name__', fn)}): {e}")
+        return fallback
+
+def _image_area(path: str) -> int:
+    """Pixel count from the image header only (no decode); unreadable files sort first and fail on load."""
+    try:
+        with PILImage.open(path) as img:
+            width, height = img.size
+        return width * height
+    except Exception:
+        return 0
+
+def _load_rgb(path: str) -> PILImage.Image:
+    with PILImage.open(path) as img:
+        return img.convert("RGB")
+
+def _generated_text(output) -> Optional[str]:
+    """Pull the caption out of one image's pipeline output ([{'generated_text': ...}])."""
+    if isinstance(output, list) and output:
+        output = output[0]
+    if isinstance(output, dict) and 'generated_text' in output:
+        return output['generated_text'].strip()
+    return None
+
+def _run_captioner(captioning_pipeline, images: List[PILImage.Image]) -> list:
+    outputs = captioning_pipeline(images, batch_size=len(images), generate_kwargs=CAPTIONING_GENERATION_ARGS)
+    if len(images) == 1 and outputs and isinstance(outputs[0], dict):
+        outputs = [outputs]
+    return outputs
+
+def caption_image_files(
+    captioning_pipeline,
+    image_paths: List[str],
+    batch_size: Optional[int] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Caption image files in batches. Blocking (PIL decode + model inference).
+
+    Images are ordered by pixel count before batching so each batch decodes and resizes images of
+    similar cost; BLIP's processor resizes every image to the same square input, so batches need no
+    pixel padding and only the generated captions are padded. If a batch fails, its images are
+    retried one by one so a single bad file only costs its own caption.
+
+    Setting ``cancel`` stops the run before the next batch (e.g. after the request timed out).
+
+    Returns ``(captions, errors)``, both keyed by image path.
+    """
+    batch_size = max(1, batch_size or settings.CAPTIONING_BATCH_SIZE)
+    captions: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    ordered = sorted(image_paths, key=_image_area)
+
+    for start in range(0, len(ordered), batch_size):
+        if cancel is not None and cancel.is_set():
+            logger.warning(f"Captioning cancelled after {start}/{len(ordered)} image(s)")
+            break
+        batch_paths, images = [], []
+        for path in ordered[start:start + batch_size]:
+            try:
+                images.append(_load_rgb(path))
+                batch_paths.append(path)
+            except FileNotFoundError:
+                errors[path] = f"Image file not found at '{path}'. Skipping."
+            except Exception as e:
+                errors[path] = f"Unexpected error loading image '{os.path.basename(path)}': {e}. Skipping."
+        if not images:
+            continue
+
+        try:
+            outputs = _run_captioner(captioning_pipeline, images)
+        except Exception as e:
+            logger.warning(f"Batch of {len(images)} image(s) failed ({e}); captioning them one by one")
+            outputs = []
+            for path, img in zip(batch_paths, images):
+                try:
+                    outputs.append(_run_captioner(captioning_pipeline, [img])[0])
+                except Exception as single_error:
+                    logger.error(f"Error during caption generation for '{path}': {single_error}", exc_info=True)
+                    outputs.append(single_error)
+
+        for path, output in zip(batch_paths, outputs):
+            if isinstance(output, Exception):
+                errors[path] = f"Error during caption generation for '{os.path.basename(path)}': {output}."
+                continue
+            text = _generated_text(output)
+            if text is None:
+                errors[path] = f"Caption output format unexpected for '{os.path.basename(path)}': {output}. Skipping."
+            else:
+                captions[path] = text
+        logger.info(f"Captioned {min(start + batch_size, len(ordered))}/{len(ordered)} image(s)")
+
+    return captions, errors
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _state_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.CAPTIONING_WORKERS, thread_name_prefix="captioning")
+        return _executor
+
+def stop_captioning_executor():
+    """Cancel queued captioning work; running batches finish in the background."""
+    global _executor
+    with _state_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _captioning_job(captioning_pipeline, image_paths, cancel):
+    global _running
+    with _state_lock:
+        _running += 1
+    try:
+        return caption_image_files(captioning_pipeline, image_paths, cancel=cancel)
+    finally:
+        with _state_lock:
+            _running -= 1
+
+def _release(_future):
+    global _admitted
+    with _state_lock:
+        _admitted -= 1
+
+async def run_captioning(captioning_pipeline, image_paths: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Caption ``image_paths`` on the captioning executor.
+    Raises 503 when CAPTIONING_WORKERS requests are running and CAPTIONING_QUEUE_SIZE more are
+    waiting, and 504 when the request takes longer than CAPTIONING_TIMEOUT seconds.
+    """
+    global _admitted
+    executor = _get_executor()
+    with _state_lock:
+        if _admitted >= settings.CAPTIONING_WORKERS + settings.CAPTIONING_QUEUE_SIZE:
+            raise HTTPException(status_code=503, detail="Captioning queue is full, try again later.")
+        _admitted += 1
+    cancel = threading.Event()
+    try:
+        future = executor.submit(_captioning_job, captioning_pipeline, image_paths, cancel)
+    except BaseException:
+        _release(None)
+        raise
+    # Fires when the job finishes, or at once if it is cancelled while still queued
+    future.add_done_callback(_release)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=settings.CAPTIONING_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(f"Captioning {len(image_paths)} image(s) timed out after {settings.CAPTIONING_TIMEOUT}s")
+        raise HTTPException(status_code=504, detail="Captioning timed out.")
+    finally:
+        # No-op when finished; otherwise drop it from the queue or stop it at the next batch
+        future.cancel()
+        cancel.set()
+
+def captioning_status() -> Dict[str, Any]:
+    """Queue depth and capacity of the captioning executor."""
+    with _state_lock:
+        admitted, running = _admitted, _running
+    return {
+        "model_loaded": _captioner is not None,
+        "workers": settings.CAPTIONING_WORKERS,
+        "running": running,
+        "queued": admitted - running,
+        "capacity": settings.CAPTIONING_WORKERS + settings.CAPTIONING_QUEUE_SIZE,
+        "timeout_seconds": settings.CAPTIONING_TIMEOUT,
+    }
+
 async def generate_captions_for_images_in_folder(
     folder_path_relative: str,
-    base_static_path_abs: str
+    base_static_path_abs: str,
+    project_id: Optional[int] = None,
 ) -> CaptionSummaryResponse:
     """
     Processes images in a given folder and generates captions using the initialized model.
@@ -69,6 +289,8 @@ async def generate_captions_for_images_in_folder(
         folder_path_relative (str): The relative path to the folder containing images (e.g., "images/project_x").
                                    This path is relative to `base_static_path_abs`.
         base_static_path_abs (str): The absolute path to the base static directory (e.g., "/app/static").
+        project_id (Optional[int]): If given, captioned files without a tbl_images row get one in this project.
+            Existing rows (matched by filepath) are always updated.
 
     Returns:
         CaptionSummaryResponse: A summary of the captioning process.
@@ -109,59 +331,57 @@ async def generate_captions_for_images_in_folder(
     logger.info(f"Found {total_images_found} image(s) to process in folder: {requested_folder_abs}")
     logger.info(f"Using generation parameters for captions: {CAPTIONING_GENERATION_ARGS}")
 
-    for filename in image_filenames:
-        current_image_path_full_abs = os.path.join(requested_folder_abs, filename)
-        logger.info(f"\n--- Processing image: {filename} ---")
+    image_paths = [os.path.join(requested_folder_abs, filename) for filename in image_filenames]
+    file_info = await asyncio.to_thread(lambda: {path: _file_info(path) for path in image_paths})
+    content_hashes = {info["content_hash"] for info in file_info.values() if info is not None}
+    cached_captions = await _best_effort_db({}, get_captions_by_hashes, content_hashes, CAPTIONING_CONFIG_HASH)
 
-        img: Optional[PILImage.Image] = None
-        try:
-            logger.info(f"Attempting to load image: {current_image_path_full_abs}...")
-            img = PILImage.open(current_image_path_full_abs).convert("RGB")
-            logger.info(f"Image '{filename}' loaded. Mode: {img.mode}, Size: {img.size}")
-        except FileNotFoundError:
-            msg = f"Image file not found at '{current_image_path_full_abs}'. Skipping."
-            logger.error(msg)
-            errors.append(f"{filename}: {msg}")
-            continue
-        except Exception as e:
-            msg = f"Unexpected error loading image '{filename}': {e}. Skipping."
-            logger.error(msg)
-            errors.append(f"{filename}: {msg}")
-            continue
+    # Inference only for content not captioned before with this model/config, once per distinct file content
+    to_caption: Dict[str, str] = {}
+    for path, info in file_info.items():
+        if info is not None and info["content_hash"] not in cached_captions:
+            to_caption.setdefault(info["content_hash"], path)
+    logger.info(f"{len(cached_captions)} cached caption(s) reused; {len(to_caption)} distinct image(s) need inference")
+    captions, caption_errors = {}, {}
+    if to_caption:
+        captions, caption_errors = await run_captioning(captioning_pipeline, list(to_caption.values()))
 
-        if img is None:
-            msg = f"Image object is None for '{filename}'. Skipping." # Should be caught above
-            logger.error(msg)
-            errors.append(f"{filename}: {msg}")
+    reused = 0
+    to_save: List[dict] = []
+    for filename, path in zip(image_filenames, image_paths):
+        info = file_info[path]
+        if info is None:
+            errors.append(f"{filename}: Could not read image file '{path}'. Skipping.")
             continue
+        content_hash = info["content_hash"]
+        caption = cached_captions.get(content_hash)
+        if caption is not None:
+            reused += 1
+        else:
+            representative = to_caption[content_hash]
+            caption = captions.get(representative)
+            if caption is None:
+                errors.append(f"{filename}: {caption_errors.get(representative, 'No caption generated.')}")
+                continue
+        # Return the relative path from the base_static_path_abs for client use
+        client_accessible_image_path = os.path.join(folder_path_relative, filename).replace("\\", "/") # Ensure POSIX paths
+        results.append(
+            ImageCaptionResponseItem(image_path=client_accessible_image_path, description=caption)
+        )
+        to_save.append({
+            "filepaths": [path, os.path.relpath(path)],
+            "alt_text": caption,
+            "image": {"filename": filename, "filepath": os.path.relpath(path), **info["image"]},
+        })
 
-        logger.info(f"Generating caption for '{filename}'...")
-        try:
-            captions_output = captioning_pipeline(img, generate_kwargs=CAPTIONING_GENERATION_ARGS)
-            if captions_output and isinstance(captions_output, list) and len(captions_output) > 0:
-                first_result = captions_output[0]
-                if isinstance(first_result, dict) and 'generated_text' in first_result:
-                    generated_text = first_result['generated_text'].strip()
-                    logger.info(f"Generated Caption for '{filename}':\n{generated_text}\n")
-                    # Return the relative path from the base_static_path_abs for client use
-                    # This should correctly be folder_path_relative + filename
-                    client_accessible_image_path = os.path.join(folder_path_relative, filename).replace("\\", "/") # Ensure POSIX paths
-                    results.append(
-                        ImageCaptionResponseItem(image_path=client_accessible_image_path, description=generated_text)
-                    )
-                else:
-                    msg = f"Caption output format unexpected for '{filename}'. First: {first_result}. Skipping."
-                    logger.warning(msg)
-                    errors.append(f"{filename}: {msg}")
-            else:
-                msg = f"Captioner returned empty/None output for '{filename}'. Skipping."
-                logger.warning(msg)
-                errors.append(f"{filename}: {msg}")
-        except Exception as e:
-            msg = f"Error during caption generation for '{filename}': {e}."
-            logger.error(msg, exc_info=True)
-            errors.append(f"{filename}: {msg}")
-            continue
+    # The cache is keyed by content alone, so it also serves files that have no tbl_images row
+    new_captions = {h: captions[p] for h, p in to_caption.items() if p in captions}
+    if new_captions:
+        cached = await _best_effort_db(0, store_captions, new_captions, CAPTIONING_MODEL_NAME, CAPTIONING_CONFIG_HASH)
+        logger.info(f"Cached {cached} new caption(s) in tbl_caption_cache")
+    if to_save:
+        saved = await _best_effort_db(0, save_image_captions, to_save, project_id)
+        logger.info(f"Saved {saved} caption(s) to tbl_images")
 
     successfully_captioned_count = len(results)
     if successfully_captioned_count == total_images_found and total_images_found > 0:
@@ -179,5 +399,6 @@ async def generate_captions_for_images_in_folder(
         successfully_captioned=successfully_captioned_count,
         results=results,
         message=message,
-        errors=errors
+        errors=errors,
+        reused_captions=reused,
     )
@@ -1,38 +1,79 @@
-from app.helper.md_to_docx import html_to_docx
-from app.helper.doc_format import Document, process_docx_tables
-
 import os
-from google import genai
+import asyncio
+import logging
 import os
 import json
-import yaml
+import hashlib
+import time
 import re
-import unicodedata, string
-from google.genai import types
 from dotenv import load_dotenv
-from app.helper.md_to_docx import html_to_docx
-from app.helper.doc_format import Document, process_docx_tables
-from app.helper.google_docs import upload_docx_as_gdoc
+from app.helper.md_to_docx import build_docx
+from app.helper.json_stream import ComponentStreamParser
+from app.helper.template_renderer import ImageCounter, MissingSlot
+from app.helper.image_prep import PreparedImage, detect_mime, prepare_screenshot
+from app.helper.singleflight import SingleFlight
+from app.core.config import settings
+from app.services.llm_providers import LLMRequest, build_provider, build_router
+from app.services.block_kb import KB_PATH, get_block_kb
+from app.services.render_cache import canonical_hash, render_cache_key, get_cached_render, store_render
+from app.services.conversion_pool import run_conversion
+from app.services.drive_uploader import upload_doc
+from app.services.artifact_store import put_artifact
+from app.services.analysis_cache import analysis_cache_key, get_cached_analysis, store_analysis
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
-client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
-model = "gemini-2.5-pro-exp-03-25"
+# Primary (and optional hedge/failover) LLM providers, see LLM_PRIMARY_PROVIDER / LLM_SECONDARY_PROVIDER
+llm_router = build_router()
+# provider:model of the primary; part of every cache key so switching models invalidates results
+model = llm_router.signature
+_shortlist_provider = None
 image_dir = "images"
-output_dir = "output"
+
+# Caps the number of LLM calls this process keeps in flight at once.
+_llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+# Coalesce concurrent identical /analyze and /generate-doc requests onto one in-flight call.
+_analysis_flight = SingleFlight("analyze")
+_generate_flight = SingleFlight("generate-doc")
+
+async def _emit(progress, event, **data):
+    """Forward a progress event to the caller's callback, if one was given."""
+    if progress is not None:
+        await progress(event, data)
+
+async def _generate_text(request: LLMRequest, progress=None, label=None, on_text=None, provider=None) -> str:
+    """
+    Stream a generation from the provider router (or the given provider) and return the joined text.
+    Waits for a free slot on the per-process concurrency cap before calling out, and
+    reports a running character/token count per chunk when ``progress`` is given.
+    ``on_text`` is an optional async callback receiving each text chunk as it arrives.
+    """
+    async with _llm_semaphore:
+        parts = []
+        chars = 0
+        # Rate limiting, retries, the circuit breaker and hedging live in the provider layer
+        async for chunk in (provider or llm_router).stream(request):
+            if chunk.text:
+                parts.append(chunk.text)
+                chars += len(chunk.text)
+                if on_text is not None:
+                    await on_text(chunk.text)
+            await _emit(progress, "tokens", stage=label, chars=chars, tokens=chunk.output_tokens)
+    return "".join(parts)
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
 
 def get_block_info(template_type=None):
     """
-    Load block knowledge base and return a formatted string of block types and descriptions.
+    Return the pre-rendered list of block types and descriptions from the compiled KB.
     Optionally filter by template_type.
     """
-    kb_path = "app/aem_block_kb/block_kb.yaml"
-    with open(kb_path, "r") as kb_file:
-        kb = yaml.safe_load(kb_file)
-    blocks = [b for b in kb["blocks"] if not template_type or b.get("element") == template_type]
-    return "\n\n".join(
-        f"### {b['type']} - {b['description']} ({b['element']})" for b in blocks
-    )
+    return get_block_kb().prompt_fragment(template_type)
 
 # --------------------------------------------------------------------------- #
 # helper – extract JSON from Gemini text responses (handles code-fences, etc.)
@@ -47,11 +88,8 @@ def _extract_json(raw: str) -> str:
     # fallback – return whole string
     return raw
 
-def analyze_image(image_path: str) -> dict:
-    with open(image_path, "rb") as f:
-        img_bytes = f.read()
-
-    prompt = f"""
+def _analysis_prompt(block_info: str) -> str:
+    return f"""
 You have perfect vision and pay great attention to detail, making you an expert at analyzing user interfaces.
 Identify every UI section in the screenshot and map it to the most suitable AEM block type.
 
@@ -59,7 +97,7 @@ Identify every UI section in the screenshot and map it to the most suitable AEM
 • Output MUST be a single, valid JSON object. No extra text, no code fences.
 
 Available block types:
-{get_block_info()}
+{block_info}
 
 Expected top-level JSON structure:
 {{
@@ -80,50 +118,252 @@ Expected top-level JSON structure:
 }}
 """.strip()
 
-    contents = [
-        types.Content(
-            role="user",
-            parts=[
-                types.Part.from_bytes(mime_type="image/png", data=img_bytes),
-                types.Part.from_text(text=prompt),
-            ],
+def _shortlist_signature() -> str:
+    return (f"\n<shortlist {settings.ANALYZE_SHORTLIST_PROVIDER} top={settings.ANALYZE_SHORTLIST_TOP_N} "
+            f"budget={settings.ANALYZE_SHORTLIST_TOKEN_BUDGET} tiles=all>")
+
+async def _shortlist_blocks(kb, images: list) -> str:
+    """
+    Cheap first pass: ask a fast model to describe the page sections in a few words, then
+    rank KB blocks against that description and keep the top candidates within the token budget.
+    Every tile of a tall page is described, so blocks further down the page are ranked too.
+    Falls back to the full block list if the first pass fails.
+    """
+    global _shortlist_provider
+    requests = [
+        LLMRequest(
+            "List every UI section visible in this screenshot, top to bottom, one per line, "
+            "as a short description (e.g. 'navigation header with logo and menu', "
+            "'hero banner with headline and image', 'three product cards'). No other text.",
+            images=[_image_part(image)],
+            kind="shortlist",
         )
+        for image in images
     ]
-    config = types.GenerateContentConfig(
-        thinking_config=types.ThinkingConfig(thinking_budget=0),
-        response_mime_type="text/plain",
-    )
+    try:
+        if _shortlist_provider is None:
+            _shortlist_provider = build_provider(settings.ANALYZE_SHORTLIST_PROVIDER)
+        described = await asyncio.gather(
+            *(_generate_text(request, provider=_shortlist_provider) for request in requests)
+        )
+        sections = "\n".join(described)
+    except Exception as e:
+        logger.warning(f"Block shortlist pass failed, using the full KB: {e}")
+        return kb.prompt_fragment()
+    return kb.shortlist_fragment(sections, settings.ANALYZE_SHORTLIST_TOP_N, settings.ANALYZE_SHORTLIST_TOKEN_BUDGET)
+
+def _image_part(image: PreparedImage):
+    return (image.mime_type, image.data)
 
-    raw = "".join(
-        chunk.text
-        for chunk in client.models.generate_content_stream(
-            model=model, contents=contents, config=config
+async def _prepare_image(img_bytes: bytes, image_name: str = None) -> list:
+    """Downscale, re-encode and tile the screenshot off the event loop; falls back to the raw bytes."""
+    try:
+        return await asyncio.to_thread(
+            prepare_screenshot,
+            img_bytes,
+            settings.ANALYZE_MAX_WIDTH,
+            settings.ANALYZE_TILE_HEIGHT,
+            settings.ANALYZE_TILE_OVERLAP,
+            settings.ANALYZE_JPEG_QUALITY,
+            settings.ANALYZE_PASSTHROUGH_MAX_BYTES,
         )
+    except Exception as e:
+        logger.warning(f"Screenshot preprocessing failed, sending original bytes: {e}")
+        return [PreparedImage(img_bytes, detect_mime(img_bytes, image_name))]
+
+def _component_identity(comp) -> str:
+    return json.dumps([comp.get("type"), comp.get("properties", {})], sort_keys=True)
+
+def _merge_tile_results(results: list) -> dict:
+    """
+    Join per-tile analyses top to bottom. A component repeated from the previous tile (it sat
+    in the overlap) is dropped, and a global block such as a sticky header is kept only once.
+    """
+    page_title = next((r.get("page_title") for r in results if r.get("page_title")), None)
+    components, seen_global, previous = [], set(), set()
+    for r in results:
+        current = set()
+        for comp in r.get("components", []):
+            identity = _component_identity(comp)
+            current.add(identity)
+            if identity in previous:
+                continue
+            if comp.get("element_type") == "global":
+                if identity in seen_global:
+                    continue
+                seen_global.add(identity)
+            components.append(comp)
+        previous = current
+    return {"page_title": page_title, "components": components}
+
+async def _analyze_tile(tile: PreparedImage, index: int, count: int, prompt: str, progress=None) -> dict:
+    tile_prompt = (
+        f"{prompt}\n\nThis image is part {index + 1} of {count} of one tall page screenshot, "
+        f"covering pixels {tile.top}-{tile.top + tile.height} from the top. "
+        "Report only the sections visible in this part."
     )
+    request = LLMRequest(tile_prompt, images=[_image_part(tile)], kind="analyze")
+    raw = await _generate_text(request, progress=progress, label=f"analyzing tile {index + 1}/{count}")
+    return json.loads(_extract_json(raw))
 
+async def analyze_image(image_path: str, progress=None) -> dict:
+    """
+    Phase 1: Identify the UI sections of a screenshot and return them as page JSON.
+    ``progress`` is an optional async callback receiving (event, data) stage updates, including
+    a ``component`` event for each section as soon as it has been fully streamed.
+    """
+    img_bytes = await asyncio.to_thread(_read_bytes, image_path)
+    return await analyze_image_bytes(img_bytes, os.path.basename(image_path), progress)
+
+async def analyze_image_bytes(img_bytes: bytes, image_name: str, progress=None) -> dict:
+    """Analyze an already-loaded screenshot; see analyze_image."""
+    await _emit(progress, "stage", stage="analyzing", image=image_name)
+
+    kb = get_block_kb()
+    prompt = _analysis_prompt(kb.prompt_fragment())
+    shortlisting = settings.ANALYZE_SHORTLIST_ENABLED and len(kb.blocks) > settings.ANALYZE_SHORTLIST_TOP_N
+    # The shortlist is derived from the image and the KB, so the full-KB prompt still identifies the request
+    cache_key = analysis_cache_key(img_bytes, prompt + (_shortlist_signature() if shortlisting else ""), model)
+    cached = await get_cached_analysis(cache_key)
+    if cached is not None:
+        await _emit(progress, "stage", stage="cached")
+        for index, comp in enumerate(cached.get("components", [])):
+            await _announce_component(index, comp, progress)
+        return cached
+
+    # Identical requests already in flight share one LLM call instead of each paying for it
+    led = False
+
+    async def lead():
+        nonlocal led
+        led = True
+        return await _analyze_uncached(
+            img_bytes, image_name, kb, prompt, shortlisting, cache_key, progress
+        )
+
+    result = await _analysis_flight.do(cache_key["cache_key"], lead)
+    if not led:
+        await _emit(progress, "stage", stage="coalesced")
+        for index, comp in enumerate(result.get("components", [])):
+            await _announce_component(index, comp, progress)
+    return result
+
+async def _analyze_uncached(
+    img_bytes, image_name, kb, prompt, shortlisting, cache_key, progress=None
+) -> dict:
+    prepared = await _prepare_image(img_bytes, image_name)
+
+    if shortlisting:
+        await _emit(progress, "stage", stage="shortlisting")
+        prompt = _analysis_prompt(await _shortlist_blocks(kb, prepared))
+
+    if len(prepared) > 1:
+        # Tall page: analyze the tiles concurrently and stitch the component lists back together
+        await _emit(progress, "stage", stage="tiling", tiles=len(prepared))
+        tile_results = await asyncio.gather(
+            *(_analyze_tile(tile, i, len(prepared), prompt, progress) for i, tile in enumerate(prepared))
+        )
+        result = _merge_tile_results(tile_results)
+        for index, comp in enumerate(result["components"]):
+            await _announce_component(index, comp, progress)
+        await store_analysis(cache_key, result)
+        return result
+
+    request = LLMRequest(prompt, images=[_image_part(prepared[0])], kind="analyze")
+
+    parser = ComponentStreamParser()
+
+    async def on_text(text):
+        for comp in parser.feed(text):
+            await _announce_component(parser.emitted - 1, comp, progress)
+
+    raw = await _generate_text(request, progress=progress, label="analyzing", on_text=on_text)
+
+    # The full document stays authoritative; streamed components are an early preview of it
     payload = _extract_json(raw)
-    return json.loads(payload)  # raises if malformed
+    result = json.loads(payload)  # raises if malformed
+    await store_analysis(cache_key, result)
+    return result
+
+async def _announce_component(index, comp, progress=None):
+    """Report one streamed component, with its block mapping when the type is in the KB."""
+    if progress is not None:
+        await _emit(progress, "component", index=index, component=comp,
+                    mapped=map_component(comp, load_block_kb()))
+
+async def analyze_images_batch(image_paths: dict, progress=None) -> list:
+    """
+    Analyze many screenshots concurrently. ``image_paths`` maps the client-facing image name
+    to its path on disk. Byte-identical images are analyzed once and share the result.
+    Emits an ``image`` progress event as each image finishes; returns results in input order.
+    """
+    names = list(image_paths)
+    contents = await asyncio.gather(
+        *(asyncio.to_thread(_read_bytes, image_paths[name]) for name in names),
+        return_exceptions=True,
+    )
+
+    # digest -> first image name with those bytes
+    unique = {}
+    digests = {}
+    for name, data in zip(names, contents):
+        if isinstance(data, Exception):
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        digests[name] = digest
+        unique.setdefault(digest, (name, data))
 
-def load_block_kb(path="app/aem_block_kb/block_kb.yaml"):
+    batch_semaphore = asyncio.Semaphore(settings.BATCH_ANALYZE_CONCURRENCY)
+    results = {}
+
+    async def run(digest, name, data):
+        async with batch_semaphore:
+            try:
+                outcome = {"status": "ok", "result": await analyze_image_bytes(data, name)}
+            except Exception as e:
+                logger.error(f"Batch analysis failed for {name}: {e}", exc_info=True)
+                outcome = {"status": "error", "error": "Image analysis failed"}
+        results[digest] = outcome
+        for other, other_digest in digests.items():
+            if other_digest == digest:
+                await _emit(progress, "image", img_name=other, **outcome)
+
+    await asyncio.gather(*(run(digest, name, data) for digest, (name, data) in unique.items()))
+
+    ordered = []
+    for name, data in zip(names, contents):
+        if isinstance(data, Exception):
+            logger.error(f"Batch analysis could not read {name}: {data}", exc_info=data)
+            ordered.append({"img_name": name, "status": "error", "error": "Could not read image"})
+            continue
+        entry = {"img_name": name, **results[digests[name]]}
+        first = unique[digests[name]][0]
+        if first != name:
+            entry["duplicate_of"] = first
+        ordered.append(entry)
+    return ordered
+
+def load_block_kb(path=KB_PATH):
     """
-    Load the block knowledge base YAML and return a dict mapping block type to block info.
+    Return the compiled block knowledge base as a dict mapping block type to block info.
+    The dict is shared across requests and must not be mutated.
     """
-    with open(path) as f:
-        kb = yaml.safe_load(f)
-    return {b["type"]: b for b in kb["blocks"]}
+    return get_block_kb(path).by_type
 
-def _slug(txt: str, fallback: str = "page") -> str:
+def map_component(comp, block_kb):
     """
-    Convert a string to a safe filename slug (e.g., "Home Page!" -> "home_page").
+    Map a single UI component to its block definition, or None if the type is not in the KB.
     """
-    if not txt:
-        return fallback
-    txt = unicodedata.normalize("NFKD", txt).encode("ascii", "ignore").decode()
-    txt = txt.lower()
-    allowed = string.ascii_lowercase + string.digits + "_"
-    txt = "".join(c if c in allowed else "_" for c in txt)
-    txt = re.sub(r"_+", "_", txt).strip("_")
-    return txt or fallback
+    blk = block_kb.get(comp.get("type"))
+    if not blk:
+        return None
+    return {
+        "type": comp["type"],
+        "element_type": comp.get("element_type", blk.get("element", "page-building")),
+        "properties": comp.get("properties", {}),
+        "layout": comp.get("layout", ""),
+        "kb_html": blk["html"],
+    }
 
 async def map_ui_to_blocks(page_json, block_kb):
     """
@@ -131,24 +371,60 @@ async def map_ui_to_blocks(page_json, block_kb):
     """
     mapped = []
     for comp in page_json.get("components", []):
-        blk = block_kb.get(comp["type"])
-        if not blk:
-            continue
-        mapped.append({
-            "type": comp["type"],
-            "element_type": comp.get("element_type", blk.get("element", "page-building")),
-            "properties": comp.get("properties", {}),
-            "layout": comp.get("layout", ""),
-            "kb_html": blk["html"],
-        })
+        blk = map_component(comp, block_kb)
+        if blk:
+            mapped.append(blk)
     return mapped
 
-def render_markdown(client, model, page_payload):
+def render_locally(comp):
     """
-    Phase 2: Generate HTML content from the mapped JSON and block templates using Gemini.
-    - Sends a strict prompt and the JSON payload.
-    - Returns the generated HTML.
+    Fill a slot-annotated KB template directly, without an LLM call.
+    Returns None when the component has no local template or a required slot is missing.
     """
+    template = get_block_kb().templates.get(comp.get("type"))
+    if template is None:
+        return None
+    try:
+        # Each fragment numbers its images from 1; _stitch_fragments renumbers across the page
+        return template.render(comp.get("properties", {}), ImageCounter())
+    except MissingSlot as e:
+        logger.info(f"Local render of {comp.get('type')} skipped, missing slot {e}; falling back to the LLM")
+        return None
+
+async def render_markdown(page_payload, progress=None, label=None):
+    """
+    Phase 2: Generate HTML content from the mapped JSON and block templates.
+    - Components with a local template are filled in directly.
+    - Each run of consecutive components that needs free-form generation is sent to the LLM.
+    - The fragments are stitched back together in source order. Returns the generated HTML.
+    """
+    components = page_payload.get("components", [])
+    segments = []  # local HTML strings and lists of components for the LLM, in source order
+    for comp in components:
+        html = render_locally(comp)
+        if html is not None:
+            segments.append(html)
+        elif segments and isinstance(segments[-1], list):
+            segments[-1].append(comp)
+        else:
+            segments.append([comp])
+
+    llm_runs = [seg for seg in segments if isinstance(seg, list)]
+    local_count = len(components) - sum(len(run) for run in llm_runs)
+    if local_count:
+        await _emit(progress, "stage", stage="rendered-locally", target=label,
+                    components=local_count, remaining=len(components) - local_count)
+    if not llm_runs:
+        return _stitch_fragments(segments)
+
+    rendered = await asyncio.gather(
+        *(_render_with_llm({**page_payload, "components": run}, progress, label) for run in llm_runs)
+    )
+    rendered = iter(rendered)
+    return _stitch_fragments([next(rendered) if isinstance(seg, list) else seg for seg in segments])
+
+async def _render_with_llm(page_payload, progress=None, label=None):
+    """Render the payload's components with the LLM using the strict template prompt."""
     prompt = f"""
 You are an expert AEM content author.
 
@@ -177,64 +453,231 @@ CRITICAL: DO NOT KEEP ANY EXAMPLE TEXT FROM THE TEMPLATES EXCEPT FOR METADATA TA
 page_payload:
 {json.dumps(page_payload, indent=2)}
 """
-    contents = [
-        types.Content(
-            role="user",
-            parts=[types.Part.from_text(text=prompt)]
+    first_chunk = []
+
+    async def note_first_chunk(text):
+        if not first_chunk:
+            first_chunk.append((time.monotonic(), len(text)))
+
+    html = await _generate_text(LLMRequest(prompt, kind="render"), progress=progress, label=label, on_text=note_first_chunk)
+    if first_chunk:
+        # Timed from the first chunk, so waiting for a concurrency slot, the rate limiter or a retry
+        # is not taken for slow generation (which would split pages into ever more groups under load)
+        at, first_chars = first_chunk[0]
+        _record_render_rate(len(html) - first_chars, time.monotonic() - at)
+    return html
+
+def store_outputs(html, docx):
+    """Put the final HTML/DOCX in the content-addressed artifact store (if KEEP_OUTPUT_ARTIFACTS)."""
+    if not settings.KEEP_OUTPUT_ARTIFACTS:
+        return None
+    return {"html": put_artifact(html.encode("utf-8"), "html"), "docx": put_artifact(docx, "docx")}
+
+async def _keep_outputs(html, docx, progress=None, **label):
+    artifacts = await asyncio.to_thread(store_outputs, html, docx)
+    if artifacts:
+        await _emit(progress, "artifact", html=artifacts["html"]["url"], docx=artifacts["docx"]["url"], **label)
+
+async def save_html_and_docx(html, progress=None, **label) -> bytes:
+    """
+    Convert HTML to post-processed DOCX bytes in the conversion process pool and keep both in the
+    artifact store. Returns the DOCX bytes.
+    """
+    docx = await run_conversion(build_docx, html)
+    await _keep_outputs(html, docx, progress, **label)
+    return docx
+
+
+async def render_global_block(blk_type, comp, project_id=None, progress=None):
+    """
+    Render one global block and write its HTML/DOCX; global blocks are not uploaded.
+    Identical blocks already rendered for the project reuse the earlier output.
+    Returns ``(html, docx)``, or None when the block rendered to nothing.
+    """
+    key = render_cache_key(comp, model)
+    cached = get_cached_render(project_id, key)
+    if cached is not None:
+        await _emit(progress, "stage", stage="cached", block=blk_type)
+        # Re-putting is a no-op for stored content and restores anything evicted since
+        await _keep_outputs(cached["html"], cached["docx"], progress, block=blk_type)
+        return cached["html"], cached["docx"]
+    await _emit(progress, "stage", stage="rendering", block=blk_type)
+    html = (await render_markdown({"components": [comp]}, progress, blk_type)).strip()
+    if html:
+        await _emit(progress, "stage", stage="converting", block=blk_type)
+        # pandoc and python-docx run in the conversion process pool, off the event loop and the GIL
+        docx = await save_html_and_docx(html, progress, block=blk_type)
+        store_render(project_id, key, html, docx)
+        return html, docx
+    return None
+
+# Observed LLM render throughput (output chars per second of streaming), smoothed across calls
+_render_rate = {"chars_per_sec": None}
+_MEDIA_REF = re.compile(r"media/image(\d+)\.jpeg")
+
+def _record_render_rate(chars: int, seconds: float):
+    if chars <= 0 or seconds <= 0:
+        return
+    rate = chars / seconds
+    previous = _render_rate["chars_per_sec"]
+    _render_rate["chars_per_sec"] = rate if previous is None else 0.8 * previous + 0.2 * rate
+
+def _group_components(components):
+    """
+    Split components, in source order, into groups whose estimated output should render within
+    RENDER_LATENCY_BUDGET seconds at the observed throughput. A component is never split.
+    """
+    rate = _render_rate["chars_per_sec"] or settings.RENDER_DEFAULT_CHARS_PER_SEC
+    max_chars = rate * settings.RENDER_LATENCY_BUDGET
+    templates = get_block_kb().templates
+    groups, current, current_chars = [], [], 0
+    for comp in components:
+        if comp.get("type") in templates:
+            # Rendered locally, so it adds next to nothing to the group's latency
+            estimate = 0
+        else:
+            # The template plus the content dominates what the model writes back
+            estimate = len(comp.get("kb_html", "")) + len(json.dumps(comp.get("properties", {})))
+        if current and current_chars + estimate > max_chars:
+            groups.append(current)
+            current, current_chars = [], 0
+        current.append(comp)
+        current_chars += estimate
+    if current:
+        groups.append(current)
+    return groups
+
+def _stitch_fragments(fragments):
+    """Join fragments in order, renumbering media/image#.jpeg so numbering runs across the page."""
+    next_number = 1
+    stitched = []
+    for fragment in fragments:
+        mapping = {}
+
+        def renumber(match):
+            nonlocal next_number
+            if match.group(1) not in mapping:
+                mapping[match.group(1)] = next_number
+                next_number += 1
+            return f"media/image{mapping[match.group(1)]}.jpeg"
+
+        stitched.append(_MEDIA_REF.sub(renumber, fragment.strip()))
+    return "\n".join(f for f in stitched if f)
+
+async def _render_split(components, progress=None, label=None):
+    """
+    Render a large page as independent component groups in parallel and stitch the results back
+    in source order. Only groups that fail are retried, up to RENDER_GROUP_RETRIES times.
+    """
+    groups = _group_components(components)
+    await _emit(progress, "stage", stage="split", target=label, groups=len(groups))
+    fragments = [None] * len(groups)
+    pending = list(range(len(groups)))
+    last_error = None
+    for attempt in range(settings.RENDER_GROUP_RETRIES + 1):
+        results = await asyncio.gather(
+            *(render_markdown({"components": groups[i]}, progress, f"{label} [{i + 1}/{len(groups)}]") for i in pending),
+            return_exceptions=True,
         )
-    ]
-    config = types.GenerateContentConfig(
-        thinking_config=types.ThinkingConfig(thinking_budget=0),
-        response_mime_type="text/plain",
-    )
-    return "".join(chunk.text for chunk in client.models.generate_content_stream(model=model, contents=contents, config=config))
+        failed = []
+        for i, result in zip(pending, results):
+            if isinstance(result, Exception) or not result.strip():
+                logger.warning(f"Render of {label} group {i + 1} failed (attempt {attempt + 1}): {result!r:.200}")
+                failed.append(i)
+                if isinstance(result, Exception):
+                    last_error = result
+            else:
+                fragments[i] = result
+        if not failed:
+            return _stitch_fragments(fragments)
+        pending = failed
+    raise RuntimeError(f"Rendering {label} failed for component group(s) {[i + 1 for i in pending]}") from last_error
 
-def save_html_and_docx(html, fname_base):
+async def render_page_html(page, progress=None):
+    """Render one page's components to HTML, splitting large pages into parallel groups."""
+    await _emit(progress, "stage", stage="rendering", page=page["title"])
+    templates = get_block_kb().templates
+    needs_llm = sum(1 for comp in page["components"] if comp.get("type") not in templates)
+    if needs_llm >= settings.RENDER_SPLIT_THRESHOLD:
+        return (await _render_split(page["components"], progress, page["title"])).strip()
+    return (await render_markdown({"components": page["components"]}, progress, page["title"])).strip()
+
+async def _render_page(page, progress=None):
+    """Render one page, write its HTML/DOCX and upload it. Returns the Google Docs link."""
+    html = await render_page_html(page, progress)
+    if not html:
+        return None
+    await _emit(progress, "stage", stage="converting", page=page["title"])
+    docx = await save_html_and_docx(html, progress, page=page["title"])
+    await _emit(progress, "stage", stage="uploading", page=page["title"])
+    return await upload_doc(docx, page['title'])
+
+async def generate_docs(ui_json, mapped, image_path, project_id=None, progress=None):
     """
-    Save HTML to file, convert to DOCX, and enhance DOCX formatting.
+    Phase 3: Render the mapped components into HTML/DOCX per global block and page and upload
+    the page to Google Docs. Returns the Google Docs link of the page.
+    Concurrent calls with an identical payload share a single run.
     """
-    html_fname = f"{fname_base}.html"
-    docx_fname = f"{fname_base}.docx"
-    with open(html_fname, "w") as f:
-        f.write(html)
-    print(f"✓ saved → {html_fname}")
-    html_to_docx(html_fname, docx_fname)
-    print(f"✓ converted to DOCX → {docx_fname}")
-    doc = Document(docx_fname)
-    process_docx_tables(doc)
-    doc.save(docx_fname)
-    print(f"✓ enhanced DOCX formatting → {docx_fname}")
+    img_digest = await asyncio.to_thread(lambda: hashlib.sha256(_read_bytes(image_path)).hexdigest())
+    key = canonical_hash({
+        "ui_json": ui_json,
+        "mapped": mapped,
+        "image": img_digest,
+        "project_id": project_id,
+        "model": model,
+    })
+    led = False
 
+    async def lead():
+        nonlocal led
+        led = True
+        return await _generate_docs(ui_json, mapped, image_path, project_id, progress)
 
-async def generate_docs(ui_json, mapped, image_path):
+    result = await _generate_flight.do(key, lead)
+    if not led:
+        await _emit(progress, "stage", stage="coalesced")
+    return result
 
-    global_blocks = {}  
-    pages = [] 
+def split_global_blocks(mapped):
+    """Split mapped components into ``({block type: first global component}, page components)``."""
+    global_blocks = {}
     page_building = []
     for comp in mapped:
         if comp["element_type"] == "global":
             global_blocks.setdefault(comp["type"], comp)
         else:
             page_building.append(comp)
+    return global_blocks, page_building
+
+async def _generate_docs(ui_json, mapped, image_path, project_id=None, progress=None):
+
+    global_blocks, page_building = split_global_blocks(mapped)
+    pages = []
     pages.append({
         "title": ui_json.get("page_title") or os.path.splitext(os.path.basename(image_path))[0],
         "components": page_building
     })
 
-    # Render and save all global blocks (once per type)
-    for blk_type, comp in global_blocks.items():
-        html = render_markdown(client, model, {"components": [comp]}).strip()
-        if html:
-            fname_base = os.path.join(output_dir, _slug(blk_type))
-            save_html_and_docx(html, fname_base)
+    # Global blocks (once per type) and pages render concurrently, bounded per request.
+    render_semaphore = asyncio.Semaphore(settings.RENDER_MAX_PARALLEL)
 
-    # Render and save each page (excluding global blocks)
-    for page in pages:
-        if not page["components"]:
-            continue
-        html = render_markdown(client, model, {"components": page["components"]}).strip()
-        if html:
-            fname_base = os.path.join(output_dir, _slug(page['title']))
-            save_html_and_docx(html, fname_base)
-            google_docs_link = upload_docx_as_gdoc(f"output/{fname_base}",page['title'])
-            return google_docs_link
+    async def bounded(coro):
+        async with render_semaphore:
+            return await coro
+
+    jobs = [("global", blk_type, render_global_block(blk_type, comp, project_id, progress)) for blk_type, comp in global_blocks.items()]
+    jobs += [("page", page["title"], _render_page(page, progress)) for page in pages if page["components"]]
+    results = await asyncio.gather(*(bounded(coro) for _, _, coro in jobs), return_exceptions=True)
+
+    # Join in submission order so the outcome does not depend on which render finished first
+    google_docs_link, page_error = None, None
+    for (kind, name, _), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.error(f"Rendering {kind} '{name}' failed: {result}", exc_info=result)
+            if kind == "page" and page_error is None:
+                page_error = result
+        elif kind == "page" and google_docs_link is None:
+            google_docs_link = result
+    if google_docs_link is None and page_error is not None:
+        raise page_error
+    return google_docs_link
@@ -0,0 +1,123 @@
+# app/services/conversion_pool.py
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.helper.stats import RollingWindow
+
+logger = logging.getLogger(__name__)
+
+# Worker processes and the semaphore bounding running + queued conversions; run_conversion()
+# starts them on first use if startup did not. _waiting/_in_flight feed metrics().
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_waiting = 0
+_in_flight = 0
+
+
+_queue_wait = RollingWindow()
+_run_time = RollingWindow()
+_counters = {"completed": 0, "failed": 0, "rejected": 0, "pool_restarts": 0}
+
+
+def _invoke(fn, args):
+    """Runs in the worker process; wall-clock stamps let the parent split queue wait from run time."""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time()
+
+
+def _new_executor() -> ProcessPoolExecutor:
+    # spawn: the API process runs an event loop and threads, which fork() would copy half-initialised
+    return ProcessPoolExecutor(
+        max_workers=settings.CONVERSION_POOL_SIZE,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def start_conversion_pool():
+    """Create the process pool. With CONVERSION_POOL_SIZE=0 conversions run on threads in-process."""
+    global _executor, _slots
+    if _slots is not None:
+        return
+    _slots = asyncio.Semaphore(max(1, settings.CONVERSION_POOL_SIZE) + settings.CONVERSION_QUEUE_SIZE)
+    if settings.CONVERSION_POOL_SIZE > 0:
+        _executor = _new_executor()
+        # Spawn the workers now rather than on the first request's critical path
+        for _ in range(settings.CONVERSION_POOL_SIZE):
+            _executor.submit(int)
+    logger.info(f"Conversion pool started with {settings.CONVERSION_POOL_SIZE} process(es)")
+
+
+def stop_conversion_pool():
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor, _slots = None, None
+
+
+async def run_conversion(fn, *args):
+    """
+    Run ``fn(*args)`` (a picklable top-level function) in the conversion pool and return its result.
+    At most CONVERSION_POOL_SIZE jobs run and CONVERSION_QUEUE_SIZE more are queued; further callers
+    wait up to CONVERSION_QUEUE_TIMEOUT seconds for a slot and then get a 503.
+    """
+    global _executor, _waiting, _in_flight
+    if _slots is None:
+        start_conversion_pool()
+    slots, pool = _slots, _executor
+    submitted = time.time()
+    _waiting += 1
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=settings.CONVERSION_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _counters["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Document conversion is saturated, try again later.")
+    finally:
+        _waiting -= 1
+    _in_flight += 1
+    try:
+        if pool is None:
+            result, started, finished = await asyncio.to_thread(_invoke, fn, args)
+        else:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(pool, _invoke, fn, args)
+    except BrokenProcessPool:
+        # A worker died (OOM, segfault in pandoc bindings...): replace the pool for later jobs
+        _counters["failed"] += 1
+        if _executor is pool:
+            _counters["pool_restarts"] += 1
+            logger.error("Conversion pool broken, restarting it")
+            _executor = _new_executor()
+            pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    except Exception:
+        _counters["failed"] += 1
+        raise
+    finally:
+        _in_flight -= 1
+        slots.release()
+    _queue_wait.record(started - submitted)
+    _run_time.record(finished - started)
+    _counters["completed"] += 1
+    logger.debug(f"{getattr(fn, '__name__', fn)}: waited {started - submitted:.3f}s, ran {finished - started:.3f}s")
+    return result
+
+
+def metrics() -> dict:
+    return {
+        "pool_size": settings.CONVERSION_POOL_SIZE,
+        "queue_size": settings.CONVERSION_QUEUE_SIZE,
+        "in_flight": _in_flight,
+        "waiting": _waiting,
+        "queue_wait_seconds": _queue_wait.summary(),
+        "run_time_seconds": _run_time.summary(),
+        **_counters,
+    }
@@ -0,0 +1,101 @@
+# app/services/drive_uploader.py
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from app.core.config import settings
+from app.helper.google_docs import is_transient, upload_docx_as_gdoc
+from app.helper.retry import retry_async
+
+logger = logging.getLogger(__name__)
+
+# Pending uploads, the tasks draining them and the threads the blocking Drive client runs on
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_executor: Optional[ThreadPoolExecutor] = None
+_counters = {"uploaded": 0, "failed": 0, "retried": 0, "upload_seconds_total": 0.0}
+
+
+async def _upload_with_retries(docx, title: str):
+    """Whole-upload retries on top of the per-chunk resume in upload_docx_as_gdoc."""
+    loop = asyncio.get_running_loop()
+
+    def count_retry(exc, attempt):
+        _counters["retried"] += 1
+
+    return await retry_async(
+        lambda: loop.run_in_executor(_executor, upload_docx_as_gdoc, docx, title),
+        is_transient,
+        settings.DRIVE_UPLOAD_MAX_ATTEMPTS,
+        settings.DRIVE_UPLOAD_RETRY_BASE_DELAY,
+        settings.DRIVE_UPLOAD_RETRY_MAX_DELAY,
+        label=f"Upload of '{title}'",
+        on_retry=count_retry,
+    )
+
+
+async def _worker(worker_id: int):
+    while True:
+        docx, title, future = await _queue.get()
+        try:
+            if future.cancelled():
+                continue
+            started = time.monotonic()
+            try:
+                link = await _upload_with_retries(docx, title)
+            except Exception as e:
+                _counters["failed"] += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                _counters["uploaded"] += 1
+                _counters["upload_seconds_total"] += time.monotonic() - started
+                if not future.done():
+                    future.set_result(link)
+        finally:
+            _queue.task_done()
+
+
+async def start_drive_uploader():
+    global _queue, _workers, _executor
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue(maxsize=settings.DRIVE_UPLOAD_QUEUE_SIZE)
+    _executor = ThreadPoolExecutor(
+        max_workers=settings.DRIVE_UPLOAD_CONCURRENCY, thread_name_prefix="drive-upload"
+    )
+    _workers = [asyncio.create_task(_worker(i)) for i in range(settings.DRIVE_UPLOAD_CONCURRENCY)]
+    logger.info(f"Started {len(_workers)} Drive upload worker(s)")
+
+
+async def stop_drive_uploader():
+    global _queue, _workers, _executor
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _queue, _workers, _executor = None, [], None
+
+
+async def upload_doc(docx, title: str) -> str:
+    """
+    Queue a DOCX (bytes or path) for upload as a Google Doc and wait for its webViewLink.
+    At most DRIVE_UPLOAD_CONCURRENCY uploads run at once; when DRIVE_UPLOAD_QUEUE_SIZE uploads
+    are already waiting, callers block here until there is room.
+    """
+    if _queue is None:
+        await start_drive_uploader()
+    future = asyncio.get_running_loop().create_future()
+    await _queue.put((docx, title, future))
+    return await future
+
+
+def metrics() -> dict:
+    return {
+        "concurrency": settings.DRIVE_UPLOAD_CONCURRENCY,
+        "queued": _queue.qsize() if _queue is not None else 0,
+        **{k: round(v, 3) if isinstance(v, float) else v for k, v in _counters.items()},
+    }
@@ -0,0 +1,204 @@
+# app/services/export_service.py
+import asyncio
+import io
+import json
+import logging
+import re
+import time
+import zipfile
+from typing import AsyncIterator, List, Optional
+
+from app.core.config import settings
+from app.crud.page import get_pages_by_project
+from app.crud.project import get_project
+from app.db.session import run_in_session
+from app.services.chat_service import (
+    load_block_kb,
+    map_ui_to_blocks,
+    model,
+    render_global_block,
+    render_page_html,
+    save_html_and_docx,
+    split_global_blocks,
+)
+from app.services.render_cache import render_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target for ZipFile; the bytes written so far are drained after each entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe_name(text: str, fallback: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]+", "-", text or "").strip("-.")
+    return name[:80] or fallback
+
+
+def _project_pages(db, project_id: int) -> Optional[List[dict]]:
+    if get_project(db, project_id) is None:
+        return None
+    pages = get_pages_by_project(db, project_id, limit=settings.EXPORT_MAX_PAGES)
+    return [
+        {"id": p.id, "name": p.page_name, "url": p.page_url, "body": p.page_body}
+        for p in pages
+    ]
+
+
+def load_project_pages(project_id: int) -> Optional[List[dict]]:
+    """Plain dicts for the project's pages in sort order, or None if the project does not exist."""
+    return run_in_session(_project_pages, project_id)
+
+
+async def _page_content(body: Optional[str]):
+    """
+    Interpret ``tbl_pages.page_body``: a JSON list of mapped components, a JSON object holding
+    ``mapped_data``/``mapped`` or raw UI JSON (``components``, mapped here), or already-rendered HTML.
+    Returns ``("mapped", components)``, ``("html", html)`` or None for an empty page.
+    """
+    body = (body or "").strip()
+    if not body:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return "html", body
+    if isinstance(data, list):
+        return "mapped", data
+    if isinstance(data, dict):
+        mapped = data.get("mapped_data") or data.get("mapped")
+        if mapped is None and "components" in data:
+            mapped = await map_ui_to_blocks(data, load_block_kb())
+        if mapped:
+            return "mapped", mapped
+    return None
+
+
+async def _plan(project_id: int, pages: List[dict]):
+    """Build the export jobs: each distinct global block once across the project, then every page."""
+    global_jobs, page_jobs, seen, used_names = {}, [], set(), set()
+    for index, page in enumerate(pages, start=1):
+        name = f"pages/{index:03d}-{_safe_name(page['name'], str(page['id']))}"
+        content = await _page_content(page["body"])
+        if content is None:
+            page_jobs.append({"kind": "page", "name": name, "page": page, "skip": "empty page_body"})
+            continue
+        kind, data = content
+        if kind == "html":
+            page_jobs.append({"kind": "page", "name": name, "page": page, "html": data})
+            continue
+        global_blocks, components = split_global_blocks(data)
+        for blk_type, comp in global_blocks.items():
+            key = render_cache_key(comp, model)
+            if key in seen:
+                continue
+            seen.add(key)
+            base = f"global/{_safe_name(blk_type, 'block')}"
+            gname = base if base not in used_names else f"{base}-{key[:8]}"
+            used_names.add(gname)
+            global_jobs[key] = {"kind": "global", "name": gname, "type": blk_type, "comp": comp}
+        page_jobs.append({"kind": "page", "name": name, "page": page, "components": components})
+    return list(global_jobs.values()) + page_jobs
+
+
+async def _run_job(job, project_id: int):
+    """Render one export job; returns ``[(zip path, bytes), ...]``."""
+    if job.get("skip"):
+        return []
+    if job["kind"] == "global":
+        rendered = await render_global_block(job["type"], job["comp"], project_id)
+        if rendered is None:
+            return []
+        html, docx = rendered
+    else:
+        page = job["page"]
+        html = job.get("html")
+        if html is None:
+            if not job["components"]:
+                return []
+            html = await render_page_html({"title": page["name"], "components": job["components"]})
+            if not html:
+                return []
+        docx = await save_html_and_docx(html, page=page["name"])
+    return [(f"{job['name']}.html", html.encode("utf-8")), (f"{job['name']}.docx", docx)]
+
+
+def _write_entries(zf: zipfile.ZipFile, entries):
+    for arcname, data in entries:
+        # DOCX is already a zip; deflating it again only costs CPU
+        compress = zipfile.ZIP_STORED if arcname.endswith(".docx") else zipfile.ZIP_DEFLATED
+        zf.writestr(arcname, data, compress_type=compress)
+
+
+async def export_project_zip(project_id: int, pages: List[dict]) -> AsyncIterator[bytes]:
+    """
+    Render every page of a project, and every distinct global block once, with at most
+    EXPORT_MAX_PARALLEL jobs in flight, and stream a ZIP of the HTML/DOCX outputs as jobs finish.
+    Finished jobs wait in a queue of the same size, so a slow client pauses rendering instead of
+    buffering the project. A failed job is recorded in manifest.json, the last entry.
+    """
+    started = time.monotonic()
+    jobs = await _plan(project_id, pages)
+    pending: asyncio.Queue = asyncio.Queue()
+    for job in jobs:
+        pending.put_nowait(job)
+    done: asyncio.Queue = asyncio.Queue(maxsize=settings.EXPORT_MAX_PARALLEL)
+
+    async def worker():
+        while True:
+            try:
+                job = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await done.put((job, await _run_job(job, project_id), None))
+            except Exception as e:
+                logger.exception(f"Export of {job['name']} for project {project_id} failed: {e}")
+                await done.put((job, [], e))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(settings.EXPORT_MAX_PARALLEL, len(jobs)) or 1)]
+    sink = _ZipSink()
+    zf = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED)
+    manifest = {"project_id": project_id, "entries": []}
+    try:
+        for _ in range(len(jobs)):
+            job, entries, error = await done.get()
+            await asyncio.to_thread(_write_entries, zf, entries)
+            record = {"name": job["name"], "kind": job["kind"], "files": [name for name, _ in entries]}
+            if error is not None:
+                # The manifest goes to the client; the exception itself was logged by the worker
+                record.update(status="failed", error="Rendering failed")
+            elif job.get("skip"):
+                record.update(status="skipped", reason=job["skip"])
+            else:
+                record["status"] = "ok" if entries else "empty"
+            if job["kind"] == "page":
+                record.update(page_id=job["page"]["id"], page_url=job["page"]["url"])
+            manifest["entries"].append(record)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        manifest["elapsed_seconds"] = round(time.monotonic() - started, 3)
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+        zf.close()
+        yield sink.drain()
+        logger.info(f"Exported project {project_id}: {len(jobs)} job(s) in {manifest['elapsed_seconds']}s")
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,337 @@
+# app/services/job_service.py
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.crud.job import claim_job, create_job, get_claimable_jobs, get_job, renew_lease, update_job
+from app.db.session import run_in_session
+from app.helper.google_docs import is_transient as is_transient_drive_error
+from app.helper.md_to_docx import build_docx
+from app.helper.retry import retry_async
+from app.services.artifact_store import resolve_artifact
+from app.services.chat_service import render_global_block, render_page_html, split_global_blocks, store_outputs
+from app.services.conversion_pool import run_conversion
+from app.services.drive_uploader import upload_doc
+from app.services.llm_client import CircuitOpenError, is_retryable
+
+logger = logging.getLogger(__name__)
+
+# Worker queue of this process; jobs are only run after claim_job() wins them in the database
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+# Jobs sitting in _queue, so a sweep does not queue them twice
+_queued: Set[str] = set()
+# Queue slots held by submits/retries that are still writing their row
+_reserved = 0
+# Identifies this process as a job's lease owner across hosts and uvicorn workers
+_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def _db_call(fn, *args, **kwargs):
+    return await asyncio.to_thread(run_in_session, fn, *args, **kwargs)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    """Errors worth retrying a stage for: provider/Drive outages and saturated pools, not bugs or bad input."""
+    if isinstance(exc, HTTPException):
+        return exc.status_code in (503, 504)
+    if isinstance(exc, (CircuitOpenError, BrokenProcessPool)):
+        return True
+    if is_retryable(exc) or is_transient_drive_error(exc):
+        return True
+    return exc.__cause__ is not None and _is_transient(exc.__cause__)
+
+
+def _lease_until() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+async def _load_docx(html: str, artifacts: Optional[dict]) -> bytes:
+    """DOCX of a converted page when resuming at the upload stage: from the artifact store, else re-converted."""
+    if artifacts:
+        resolved = resolve_artifact(artifacts["docx"]["name"])
+        if resolved is not None:
+            return await asyncio.to_thread(lambda: open(resolved[0], "rb").read())
+    return await run_conversion(build_docx, html)
+
+
+async def _run_generate_doc(payload: dict, stage, progress):
+    """
+    /generate-doc as resumable stages: global blocks and the page HTML render concurrently, then
+    the page is converted to DOCX (kept in the artifact store) and uploaded to Drive.
+    """
+    ui_json, mapped = payload["components_data"], payload["mapped_data"]
+    project_id = payload.get("project_id")
+    title = ui_json.get("page_title") or os.path.splitext(os.path.basename(payload["image_path"]))[0]
+    global_blocks, components = split_global_blocks(mapped)
+
+    async def render_globals():
+        types = list(global_blocks)
+        rendered = await asyncio.gather(
+            *(render_global_block(t, global_blocks[t], project_id, progress) for t in types),
+            return_exceptions=True,
+        )
+        outputs = {}
+        for blk_type, result in zip(types, rendered):
+            if isinstance(result, Exception):
+                # Global blocks are not uploaded; a failed one does not fail the page (as in /generate-doc)
+                logger.error(f"Rendering global '{blk_type}' failed: {result}", exc_info=result)
+            elif result is not None:
+                outputs[blk_type] = await asyncio.to_thread(store_outputs, *result)
+        return outputs
+
+    async def render_page():
+        if not components:
+            return ""
+        return await render_page_html({"title": title, "components": components}, progress)
+
+    docx = None
+
+    async def convert():
+        nonlocal docx
+        await progress("stage", {"stage": "converting", "page": title})
+        docx = await run_conversion(build_docx, html)
+        return await asyncio.to_thread(store_outputs, html, docx)
+
+    async def upload():
+        data = docx if docx is not None else await _load_docx(html, artifacts)
+        await progress("stage", {"stage": "uploading", "page": title})
+        return await upload_doc(data, title)
+
+    global_artifacts, html = await asyncio.gather(stage("globals", render_globals), stage("html", render_page))
+    link, artifacts = None, None
+    if html:
+        artifacts = await stage("artifacts", convert)
+        link = await stage("google_docs_link", upload)
+    return {"google_docs_link": link, "artifacts": {"page": artifacts, "global": global_artifacts}}
+
+# job_type -> coroutine function(payload, stage, progress)
+_runners = {
+    "generate-doc": _run_generate_doc,
+}
+
+
+def _free_slots() -> int:
+    return _queue.maxsize - _queue.qsize() - _reserved
+
+
+def _enqueue(job_id: str) -> None:
+    """Queue a job the caller has room for; if the workers stopped meanwhile, the row stays queued for the next start."""
+    if _queue is None or job_id in _queued:
+        return
+    _queued.add(job_id)
+    _queue.put_nowait((job_id, time.monotonic()))
+
+
+@contextmanager
+def _queue_slot():
+    """
+    Hold a queue slot while the job's row is written: checking for room and queueing straddle a
+    database await, and without the reservation two submits could both pass the check.
+    """
+    global _reserved
+    if _queue is None:
+        raise HTTPException(status_code=503, detail="Job workers are not running.")
+    if _free_slots() <= 0:
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later.")
+    _reserved += 1
+    try:
+        yield
+    finally:
+        _reserved -= 1
+
+
+async def submit_job(job_type: str, payload: dict):
+    """Persist a new job and queue it for the worker pool. Raises 503 when the queue is full."""
+    with _queue_slot():
+        job = await _db_call(create_job, job_type, payload)
+        _enqueue(job.id)
+    logger.info(f"Queued {job_type} job {job.id} (queue depth {queue_depth()})")
+    return job
+
+
+async def get_job_status(job_id: str):
+    job = await _db_call(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+async def retry_job(job_id: str):
+    """Re-queue a failed job; it resumes after the last stage that completed."""
+    job = await get_job_status(job_id)
+    if job.status != "failed":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried (job is {job.status}).")
+    with _queue_slot():
+        job = await _db_call(update_job, job_id, status="queued", stage=None, error=None, finished_at=None)
+        _enqueue(job.id)
+    return job
+
+
+async def _keep_lease(job_id: str, run: asyncio.Task, lost: asyncio.Event):
+    """Renew the job's lease while it runs; if another process has taken it over, stop this run."""
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        try:
+            renewed = await _db_call(renew_lease, job_id, _OWNER, _lease_until())
+        except Exception as e:
+            logger.warning(f"Could not renew the lease of job {job_id}: {e}")
+            continue
+        if not renewed:
+            logger.error(f"Lost the lease of job {job_id} to another process; stopping this run")
+            lost.set()
+            run.cancel()
+            return
+
+
+async def _execute(job_id: str, enqueued_at: float) -> None:
+    now = datetime.utcnow()
+    if not await _db_call(claim_job, job_id, _OWNER, _lease_until(), now):
+        # Finished, missing, or claimed by another worker or process first
+        logger.info(f"Job {job_id} is not claimable, skipping")
+        return
+    job = await _db_call(get_job, job_id)
+    runner = _runners[job.job_type]
+    timings: Dict = dict(job.timings or {})
+    timings.update(queue_wait=round(time.monotonic() - enqueued_at, 3))
+    for key in ("stages", "attempts"):
+        timings.setdefault(key, [])
+    checkpoint: Dict = dict(job.checkpoint or {})
+    save_lock = asyncio.Lock()
+    started = time.monotonic()
+    await _db_call(update_job, job_id, timings=dict(timings))
+
+    async def save(**fields):
+        # Serialised so a slower write never replaces a newer checkpoint with an older snapshot
+        async with save_lock:
+            await _db_call(update_job, job_id, checkpoint=dict(checkpoint), timings=dict(timings), **fields)
+
+    async def progress(event, data):
+        # Token counts are too chatty to persist; only stage transitions are recorded
+        if event != "stage":
+            return
+        target = data.get("block") or data.get("page") or ""
+        stage_name = f"{data['stage']} {target}".strip()
+        timings["stages"].append({"stage": stage_name, "at": round(time.monotonic() - started, 3)})
+        await save(stage=stage_name)
+
+    async def stage(name, fn):
+        """Run one stage unless an earlier run saved its output; transient failures are retried here."""
+        if name in checkpoint:
+            logger.info(f"Job {job_id}: stage '{name}' already done, resuming after it")
+            return checkpoint[name]
+        attempt_started = time.monotonic()
+
+        def on_retry(exc, attempt):
+            timings["attempts"].append({"stage": name, "ok": False, "error": str(exc)[:200],
+                                        "seconds": round(time.monotonic() - attempt_started, 3)})
+
+        value = await retry_async(fn, _is_transient, settings.JOB_MAX_ATTEMPTS, settings.JOB_RETRY_BACKOFF,
+                                  settings.JOB_RETRY_MAX_DELAY, label=f"Job {job_id} stage '{name}'",
+                                  on_retry=on_retry)
+        timings["attempts"].append({"stage": name, "ok": True, "seconds": round(time.monotonic() - attempt_started, 3)})
+        checkpoint[name] = value
+        await save()
+        return value
+
+    lost = asyncio.Event()
+    run = asyncio.create_task(runner(job.payload, stage, progress))
+    heartbeat = asyncio.create_task(_keep_lease(job_id, run, lost))
+    try:
+        result = await run
+    except asyncio.CancelledError:
+        if lost.is_set():
+            return
+        raise
+    except Exception as e:
+        logger.error(f"Job {job_id} failed (run {job.attempts}): {e}", exc_info=True)
+        timings["run"] = round(time.monotonic() - started, 3)
+        await save(status="failed", error=str(e), finished_at=datetime.utcnow(),
+                   lease_owner=None, lease_expires_at=None)
+        return
+    finally:
+        heartbeat.cancel()
+    timings["run"] = round(time.monotonic() - started, 3)
+    await save(status="succeeded", stage="done", result=result, error=None, finished_at=datetime.utcnow(),
+               lease_owner=None, lease_expires_at=None)
+    logger.info(f"Job {job_id} succeeded in {timings['run']}s (run {job.attempts})")
+
+
+async def _worker(worker_id: int) -> None:
+    while True:
+        job_id, enqueued_at = await _queue.get()
+        _queued.discard(job_id)
+        try:
+            await _execute(job_id, enqueued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} crashed on job {job_id}: {e}", exc_info=True)
+        finally:
+            _queue.task_done()
+
+
+async def _recover_jobs() -> int:
+    """Queue jobs that are waiting or whose owner's lease expired, as far as the queue has room."""
+    try:
+        pending = await _db_call(get_claimable_jobs, datetime.utcnow())
+    except Exception as e:
+        logger.error(f"Could not recover pending jobs: {e}")
+        return 0
+    queued = 0
+    for job in pending:
+        if _free_slots() <= 0:
+            break
+        if job.id not in _queued:
+            _enqueue(job.id)
+            queued += 1
+    return queued
+
+
+async def _sweeper() -> None:
+    # Recovers jobs left by a crashed process, and those that did not fit in the queue earlier
+    while True:
+        await asyncio.sleep(settings.JOB_SWEEP_INTERVAL)
+        queued = await _recover_jobs()
+        if queued:
+            logger.info(f"Job sweep queued {queued} claimable job(s)")
+
+
+async def start_job_workers() -> None:
+    """
+    Start the worker pool and queue claimable jobs, then keep sweeping for them periodically.
+    Every process does this; claim_job() lets only one of them run each job.
+    """
+    global _queue
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue(maxsize=settings.JOB_QUEUE_SIZE)
+    for i in range(settings.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(i)))
+    queued = await _recover_jobs()
+    _workers.append(asyncio.create_task(_sweeper()))
+    logger.info(f"Started {settings.JOB_WORKERS} job worker(s) as {_OWNER}; queued {queued} claimable job(s)")
+
+
+async def stop_job_workers() -> None:
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queued.clear()
+    _queue = None
+
+
+def queue_depth() -> int:
+    return _queue.qsize() if _queue is not None else 0
@@ -0,0 +1,210 @@
+# app/services/llm_client.py
+import asyncio
+import logging
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.helper.retry import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# Rough input cost of one image part, used only for tokens/minute budgeting
+IMAGE_TOKEN_ESTIMATE = 258
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM provider circuit is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``per_minute`` tokens per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Wait until ``amount`` tokens are available and take them. Returns the seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+
+class CircuitBreaker:
+    """
+    closed -> open after ``failure_threshold`` consecutive failed requests; open fails fast for
+    ``reset_timeout`` seconds; then half-open lets one probe call through to decide which way to go.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def before_call(self):
+        if self.state == "open":
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.reset_timeout)
+            self._probe_in_flight = True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"LLM circuit opened after {self.failures} consecutive failed request(s)")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Let another probe through when a half-open call ended without a verdict (e.g. cancelled)."""
+        self._probe_in_flight = False
+
+
+def is_retryable(exc: Exception) -> bool:
+    # google-genai errors carry ``code``, the OpenAI and Anthropic SDKs ``status_code``
+    status = getattr(exc, "status_code", None)
+    if not isinstance(status, int):
+        status = getattr(exc, "code", None)
+    if isinstance(status, int) and not isinstance(exc, OSError):
+        return status in RETRYABLE_STATUS_CODES
+    if type(exc).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return True
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, ConnectionError))
+
+
+def estimate_tokens(prompt: str, image_count: int = 0) -> int:
+    return len(prompt) // 4 + 1 + image_count * IMAGE_TOKEN_ESTIMATE
+
+
+class ResilientLLMClient:
+    """
+    Guards outbound streaming calls to one LLM provider with a requests/minute and tokens/minute
+    limiter, jittered exponential retries on retryable errors (only before the first chunk is
+    delivered), and a circuit breaker that fails fast while the provider is degraded. The breaker
+    counts a request once, when it has failed for good, so one request exhausting its retries
+    does not open the circuit for everyone.
+    """
+
+    def __init__(self, name: str = "gemini"):
+        self.name = name
+        self.requests = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(settings.LLM_TOKENS_PER_MINUTE)
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_RESET_TIMEOUT)
+        self.counters = {
+            "calls": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "rejected_open_circuit": 0,
+            "throttle_wait_seconds": 0.0,
+            "output_tokens": 0,
+        }
+
+    async def stream(self, open_stream, estimate: int):
+        """
+        Async generator over the chunks of one guarded call. ``open_stream`` is an async callable
+        returning the provider's chunk iterator; it is invoked again for each retry. Chunks may
+        expose ``output_tokens`` for accounting.
+        """
+        attempt = 0
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.counters["rejected_open_circuit"] += 1
+            raise
+        # Admitted once per request: retries (and a half-open probe's retries) do not ask again
+        while True:
+            self.counters["calls"] += 1
+            self.counters["throttle_wait_seconds"] += await self.requests.acquire(1)
+            self.counters["throttle_wait_seconds"] += await self.tokens.acquire(estimate)
+            delivered = False
+            output_tokens = 0
+            try:
+                stream = await open_stream()
+                async for chunk in stream:
+                    delivered = True
+                    output_tokens = getattr(chunk, "output_tokens", None) or output_tokens
+                    yield chunk
+            except Exception as e:
+                if not is_retryable(e):
+                    # A bad request says nothing about provider health
+                    self.breaker.release_probe()
+                    self.counters["failed"] += 1
+                    raise
+                if delivered or attempt >= settings.LLM_MAX_RETRIES or self.breaker.state == "open":
+                    self.breaker.record_failure()
+                    self.counters["failed"] += 1
+                    raise
+                delay = backoff_delay(attempt, settings.LLM_RETRY_BASE_DELAY, settings.LLM_RETRY_MAX_DELAY)
+                attempt += 1
+                self.counters["retries"] += 1
+                logger.warning(f"Retryable {self.name} error ({e}); retry {attempt}/{settings.LLM_MAX_RETRIES} in {delay:.1f}s")
+            except BaseException:
+                # Cancelled or abandoned mid-stream: no verdict on provider health
+                self.breaker.release_probe()
+                raise
+            else:
+                self.breaker.record_success()
+                self.counters["succeeded"] += 1
+                self.counters["output_tokens"] += output_tokens
+                return
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+
+    def metrics(self) -> dict:
+        return {
+            "provider": self.name,
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "circuit_opened_total": self.breaker.times_opened,
+            "requests_available": round(self.requests.available(), 2),
+            "tokens_available": round(self.tokens.available(), 2),
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.counters.items()},
+        }
+
@@ -0,0 +1,345 @@
+# app/services/llm_providers.py
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.helper.stats import RollingWindow
+from app.services.llm_client import ResilientLLMClient, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class LLMRequest:
+    """Provider-neutral generation request: one user turn of text plus optional images."""
+
+    def __init__(self, prompt: str, images: Optional[List[Tuple[str, bytes]]] = None, kind: str = "text"):
+        self.prompt = prompt
+        self.images = images or []  # (mime_type, bytes)
+        self.kind = kind  # analyze | render | shortlist; lets the fake provider answer sensibly
+
+
+class LLMChunk:
+    def __init__(self, text: str, output_tokens: Optional[int] = None):
+        self.text = text
+        self.output_tokens = output_tokens
+
+
+class LLMProvider(ABC):
+    """Base class: subclasses implement ``_open`` returning an async iterator of LLMChunk."""
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+        self.guard = ResilientLLMClient(self.name)
+        self.latency = RollingWindow(200)  # time-to-first-chunk samples
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    async def _open(self, request: LLMRequest, model: str) -> AsyncIterator[LLMChunk]:
+        """Start the provider call and return its chunk iterator; invoked again for each retry."""
+
+    async def stream(self, request: LLMRequest, model: Optional[str] = None) -> AsyncIterator[LLMChunk]:
+        """Stream one request through this provider's rate limiter, retries and circuit breaker."""
+        estimate = estimate_tokens(request.prompt, len(request.images))
+        started = time.monotonic()
+        first = True
+        async for chunk in self.guard.stream(lambda: self._open(request, model or self.model), estimate):
+            if first:
+                self.latency.record(time.monotonic() - started)
+                first = False
+            yield chunk
+
+    def metrics(self) -> dict:
+        p50, p95 = self.latency.percentile(50), self.latency.percentile(95)
+        return {
+            **self.guard.metrics(),
+            "model": self.model,
+            "first_chunk_p50": round(p50, 3) if p50 is not None else None,
+            "first_chunk_p95": round(p95, 3) if p95 is not None else None,
+            "latency_samples": len(self.latency.samples),
+        }
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model: str, api_key: Optional[str] = None):
+        super().__init__(model)
+        from google import genai
+        from google.genai import types
+        self._types = types
+        self.client = genai.Client(api_key=api_key or settings.GEMINI_API_KEY or os.environ["GEMINI_API_KEY"])
+
+    async def _open(self, request: LLMRequest, model: str):
+        types = self._types
+        parts = [types.Part.from_bytes(mime_type=mime, data=data) for mime, data in request.images]
+        parts.append(types.Part.from_text(text=request.prompt))
+        config = types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            response_mime_type="text/plain",
+        )
+        stream = await self.client.aio.models.generate_content_stream(
+            model=model, contents=[types.Content(role="user", parts=parts)], config=config
+        )
+        return self._chunks(stream)
+
+    @staticmethod
+    async def _chunks(stream):
+        async for chunk in stream:
+            usage = getattr(chunk, "usage_metadata", None)
+            yield LLMChunk(chunk.text or "", getattr(usage, "candidates_token_count", None) if usage else None)
+
+
+class OpenAIProvider(LLMProvider):
+    """Requires the optional ``openai`` package."""
+
+    name = "openai"
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        from openai import AsyncOpenAI
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+
+    async def _open(self, request: LLMRequest, model: str):
+        content = [
+            {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{base64.b64encode(data).decode()}"}}
+            for mime, data in request.images
+        ]
+        content.append({"type": "text", "text": request.prompt})
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": content}],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        return self._chunks(stream)
+
+    @staticmethod
+    async def _chunks(stream):
+        async for event in stream:
+            text = event.choices[0].delta.content if event.choices else None
+            usage = getattr(event, "usage", None)
+            yield LLMChunk(text or "", usage.completion_tokens if usage else None)
+
+
+class AnthropicProvider(LLMProvider):
+    """Requires the optional ``anthropic`` package."""
+
+    name = "anthropic"
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        from anthropic import AsyncAnthropic
+        self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+
+    async def _open(self, request: LLMRequest, model: str):
+        content = [
+            {"type": "image", "source": {"type": "base64", "media_type": mime, "data": base64.b64encode(data).decode()}}
+            for mime, data in request.images
+        ]
+        content.append({"type": "text", "text": request.prompt})
+        stream = await self.client.messages.create(
+            model=model,
+            max_tokens=settings.LLM_MAX_OUTPUT_TOKENS,
+            messages=[{"role": "user", "content": content}],
+            stream=True,
+        )
+        return self._chunks(stream)
+
+    @staticmethod
+    async def _chunks(stream):
+        async for event in stream:
+            if event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                yield LLMChunk(event.delta.text)
+            elif event.type == "message_delta" and getattr(event, "usage", None):
+                yield LLMChunk("", event.usage.output_tokens)
+
+
+_FAKE_ANALYSIS = {
+    "page_title": "Fake page",
+    "components": [
+        {
+            "type": "hero",
+            "properties": {"title": "Fake headline", "description": "Offline benchmark content", "imageRef": "hero"},
+            "layout": "full-width",
+            "markdown_template": "hero",
+            "element_type": "page-building",
+        },
+        {
+            "type": "footer",
+            "properties": {"title": "Footer", "description": "Links"},
+            "layout": "full-width",
+            "markdown_template": "footer",
+            "element_type": "global",
+        },
+    ],
+}
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline provider for benchmarks and local runs: canned output per request kind, delivered
+    after a configurable first-chunk latency (with jitter) and per-chunk delay.
+    """
+
+    name = "fake"
+
+    def __init__(self, model: str = "fake", first_chunk_latency: float = None,
+                 chunk_delay: float = None, jitter: float = None, chunk_size: int = 64):
+        super().__init__(model)
+        self.first_chunk_latency = settings.FAKE_LLM_LATENCY if first_chunk_latency is None else first_chunk_latency
+        self.chunk_delay = settings.FAKE_LLM_CHUNK_DELAY if chunk_delay is None else chunk_delay
+        self.jitter = settings.FAKE_LLM_JITTER if jitter is None else jitter
+        self.chunk_size = chunk_size
+
+    def _response(self, request: LLMRequest) -> str:
+        if request.kind == "analyze":
+            return json.dumps(_FAKE_ANALYSIS, indent=2)
+        if request.kind == "shortlist":
+            return "navigation header\nhero banner with headline and image\nsite footer with links"
+        return "<h2>Fake headline</h2>\n<p>Offline benchmark content.</p>\n<img src=\"media/image1.jpeg\">"
+
+    async def _open(self, request: LLMRequest, model: str):
+        return self._chunks(self._response(request))
+
+    async def _chunks(self, text: str):
+        await asyncio.sleep(max(0.0, self.first_chunk_latency + random.uniform(-self.jitter, self.jitter)))
+        for i in range(0, len(text), self.chunk_size):
+            if i:
+                await asyncio.sleep(self.chunk_delay)
+            yield LLMChunk(text[i:i + self.chunk_size])
+        yield LLMChunk("", len(text) // 4 + 1)
+
+
+_PROVIDER_CLASSES = {
+    "gemini": GeminiProvider,
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+    "fake": FakeProvider,
+}
+
+
+def build_provider(spec: str) -> LLMProvider:
+    """Build a provider from a ``name:model`` spec, e.g. ``gemini:gemini-2.5-pro`` or ``fake``."""
+    name, _, model = spec.partition(":")
+    if name not in _PROVIDER_CLASSES:
+        raise ValueError(f"Unknown LLM provider '{name}'")
+    return _PROVIDER_CLASSES[name](model or "fake") if name == "fake" else _PROVIDER_CLASSES[name](model)
+
+
+class HedgedRouter:
+    """
+    Sends each request to the primary provider. If no chunk has arrived within the primary's
+    observed p95 time-to-first-chunk, the same request is raced on the secondary and whichever
+    streams first wins; the loser is cancelled. A primary that fails before its first chunk
+    fails over to the secondary immediately.
+    """
+
+    def __init__(self, primary: LLMProvider, secondary: Optional[LLMProvider] = None):
+        self.primary = primary
+        self.secondary = secondary
+        self.counters = {"hedges_started": 0, "hedges_won": 0, "failovers": 0}
+
+    @property
+    def signature(self) -> str:
+        return self.primary.signature
+
+    def hedge_delay(self) -> float:
+        if len(self.primary.latency.samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DELAY
+        return self.primary.latency.percentile(95)
+
+    @staticmethod
+    def _start(provider: LLMProvider, request: LLMRequest):
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump():
+            try:
+                async for chunk in provider.stream(request):
+                    await queue.put(("chunk", chunk))
+                await queue.put(("end", None))
+            except Exception as e:
+                await queue.put(("error", e))
+
+        return {"provider": provider, "queue": queue, "task": asyncio.ensure_future(pump()), "get": None}
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[LLMChunk]:
+        hedging = self.secondary is not None and settings.LLM_HEDGE_ENABLED
+        contenders = [self._start(self.primary, request)]
+        secondary_started = hedged = False
+        winner, item, last_error = None, None, None
+        try:
+            while winner is None:
+                if not contenders:
+                    raise last_error
+                for c in contenders:
+                    if c["get"] is None:
+                        c["get"] = asyncio.ensure_future(c["queue"].get())
+                timeout = self.hedge_delay() if hedging and not secondary_started else None
+                done, _ = await asyncio.wait([c["get"] for c in contenders], timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.info(f"No first chunk from {self.primary.name} within {timeout:.1f}s; hedging on {self.secondary.name}")
+                    self.counters["hedges_started"] += 1
+                    contenders.append(self._start(self.secondary, request))
+                    secondary_started = hedged = True
+                    continue
+                for c in list(contenders):
+                    if c["get"] not in done:
+                        continue
+                    kind, payload = c["get"].result()
+                    c["get"] = None
+                    if kind == "error":
+                        last_error = payload
+                        contenders.remove(c)
+                        if hedging and not secondary_started and c["provider"] is self.primary:
+                            logger.warning(f"{self.primary.name} failed ({payload}); failing over to {self.secondary.name}")
+                            self.counters["failovers"] += 1
+                            contenders.append(self._start(self.secondary, request))
+                            secondary_started = True
+                        continue
+                    winner, item = c, (kind, payload)
+                    break
+
+            if hedged and winner["provider"] is not self.primary:
+                self.counters["hedges_won"] += 1
+            for c in contenders:
+                if c is not winner:
+                    c["task"].cancel()
+                    if c["get"] is not None:
+                        c["get"].cancel()
+            kind, payload = item
+            while kind == "chunk":
+                yield payload
+                kind, payload = await winner["queue"].get()
+            if kind == "error":
+                raise payload
+        finally:
+            for c in contenders:
+                c["task"].cancel()
+                if c["get"] is not None:
+                    c["get"].cancel()
+
+    def metrics(self) -> dict:
+        return {
+            "hedge_delay": round(self.hedge_delay(), 3),
+            **self.counters,
+            "providers": [p.metrics() for p in (self.primary, self.secondary) if p is not None],
+        }
+
+
+def build_router() -> HedgedRouter:
+    primary = build_provider(settings.LLM_PRIMARY_PROVIDER)
+    secondary = build_provider(settings.LLM_SECONDARY_PROVIDER) if settings.LLM_SECONDARY_PROVIDER else None
+    return HedgedRouter(primary, secondary)
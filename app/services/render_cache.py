@@ -0,0 +1,64 @@
+# app/services/render_cache.py
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.helper.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# project scope -> LRUCache(render key -> entry); least recently active projects are dropped first
+_projects = LRUCache(maxsize=settings.RENDER_CACHE_MAX_PROJECTS)
+
+
+def canonical_hash(payload) -> str:
+    """SHA-256 of a JSON payload serialised with sorted keys and no whitespace."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def render_cache_key(comp: dict, model: str) -> str:
+    """Key a rendered block by its content, its kb_html template and the model that rendered it."""
+    return canonical_hash({
+        "type": comp.get("type"),
+        "element_type": comp.get("element_type"),
+        "properties": comp.get("properties", {}),
+        "layout": comp.get("layout", ""),
+        "kb_html": comp.get("kb_html", ""),
+        "model": model,
+    })
+
+
+def _scope(project_id: Optional[int]) -> str:
+    return "default" if project_id is None else str(project_id)
+
+
+def get_cached_render(project_id: Optional[int], key: str) -> Optional[dict]:
+    """Return the cached render entry for this project, or None if missing or expired."""
+    entries = _projects.get(_scope(project_id))
+    if entries is None:
+        return None
+    entry = entries.get(key)
+    if entry is None:
+        return None
+    if time.time() - entry["created_at"] > settings.RENDER_CACHE_TTL:
+        entries.pop(key)
+        return None
+    logger.info(f"Render cache hit for project {_scope(project_id)}: {key[:12]}")
+    return entry
+
+
+def store_render(project_id: Optional[int], key: str, html: str, docx: bytes) -> None:
+    scope = _scope(project_id)
+    entries = _projects.get(scope)
+    if entries is None:
+        entries = LRUCache(maxsize=settings.RENDER_CACHE_SIZE)
+        _projects.put(scope, entries)
+    entries.put(key, {"html": html, "docx": docx, "created_at": time.time()})
+
+
+def clear_project(project_id: Optional[int]) -> None:
+    _projects.pop(_scope(project_id))
@@ -0,0 +1,87 @@
+"""
+Benchmark captioning throughput (images/sec) for one-at-a-time vs batched BLIP inference on CPU.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_captioning --images 64 --batch-sizes 1 4 8 16
+
+By default it generates synthetic images of mixed sizes; pass --folder to use real assets.
+--model defaults to the service's model; the smaller Salesforce/blip-image-captioning-base
+gives quicker runs with the same relative speed-ups.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image as PILImage, ImageDraw
+from transformers import pipeline
+
+from app.services.captioning_service import (
+    CAPTIONING_MODEL_NAME,
+    CAPTIONING_SUPPORTED_EXTENSIONS,
+    caption_image_files,
+)
+
+
+def make_images(folder, count, seed=0):
+    """Write ``count`` PNGs between 200px and 1600px a side, with a few coloured shapes each."""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        size = (rng.randint(200, 1600), rng.randint(200, 1600))
+        img = PILImage.new("RGB", size, tuple(rng.randint(0, 255) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(5):
+            x0, y0 = rng.randint(0, size[0] - 1), rng.randint(0, size[1] - 1)
+            x1, y1 = rng.randint(x0, size[0]), rng.randint(y0, size[1])
+            draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        path = os.path.join(folder, f"img_{i:04d}.png")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=32, help="synthetic images to generate")
+    parser.add_argument("--folder", help="caption the supported images in this folder instead")
+    parser.add_argument("--model", default=CAPTIONING_MODEL_NAME)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    captioner = pipeline("image-to-text", model=args.model, device=-1)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.folder:
+            paths = [
+                os.path.join(args.folder, f) for f in sorted(os.listdir(args.folder))
+                if f.lower().endswith(CAPTIONING_SUPPORTED_EXTENSIONS)
+            ]
+        else:
+            paths = make_images(tmp, args.images)
+
+        # Warm-up so model lazy-init and first-call allocations are not timed
+        caption_image_files(captioner, paths[:2], batch_size=2)
+
+        print(f"{len(paths)} image(s), model {args.model}, CPU")
+        baseline = None
+        for batch_size in args.batch_sizes:
+            started = time.perf_counter()
+            captions, errors = caption_image_files(captioner, paths, batch_size=batch_size)
+            elapsed = time.perf_counter() - started
+            rate = len(captions) / elapsed if elapsed else 0.0
+            baseline = baseline or rate
+            print(
+                f"  batch_size={batch_size:<3} {rate:7.2f} images/sec  "
+                f"({elapsed:6.1f}s, {len(errors)} error(s), {rate / baseline:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark process_docx_tables on large generated tables.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_doc_format --rows 200 --cols 8 --tables 3
+
+The previous python-docx/proxy based implementation is kept here as ``legacy_process_docx_tables``
+so both can be timed on identical documents.
+"""
+import argparse
+import io
+import random
+import time
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt
+from docx.enum.table import WD_TABLE_ALIGNMENT
+
+from app.helper.doc_format import process_docx_tables
+
+
+def _legacy_set_cell_borders(cell):
+    tcPr = cell._tc.get_or_add_tcPr()
+    for border in ('top', 'left', 'bottom', 'right'):
+        element = OxmlElement(f'w:{border}')
+        for attr, value in {'val': 'single', 'sz': '4', 'color': '000000'}.items():
+            element.set(qn(f'w:{attr}'), value)
+        tcPr.append(element)
+
+
+def _legacy_merge_empty_cells(row):
+    cells = row.cells
+    if not cells:
+        return
+    first_content_idx = next((i for i, cell in enumerate(cells) if cell.text.strip()), None)
+    if first_content_idx is not None and first_content_idx > 0:
+        cells[0].merge(cells[first_content_idx - 1])
+        cells[0].text = ""
+        cells = row.cells
+    if cells:
+        last_content_idx = len(cells) - 1 - next(
+            (i for i, cell in enumerate(reversed(cells)) if cell.text.strip()),
+            len(cells))
+        if last_content_idx < len(cells) - 1:
+            cells[last_content_idx].merge(cells[-1])
+
+
+def legacy_process_docx_tables(doc):
+    for table in doc.tables:
+        table.alignment = WD_TABLE_ALIGNMENT.CENTER
+        for row in table.rows:
+            _legacy_merge_empty_cells(row)
+            for cell in row.cells:
+                _legacy_set_cell_borders(cell)
+                for paragraph in cell.paragraphs:
+                    paragraph.style = doc.styles['Normal']
+                    paragraph.paragraph_format.space_after = Pt(0)
+
+
+def build_document(rows, cols, tables, seed=0):
+    """A DOCX with ``tables`` tables of ``rows`` x ``cols``; ~30% of rows have empty leading/trailing cells."""
+    rng = random.Random(seed)
+    doc = Document()
+    for t in range(tables):
+        doc.add_paragraph(f"Table {t + 1}")
+        table = doc.add_table(rows=rows, cols=cols)
+        for r, row in enumerate(table.rows):
+            cells = row.cells
+            lead = rng.randint(1, cols // 3) if rng.random() < 0.15 else 0
+            trail = rng.randint(1, cols // 3) if rng.random() < 0.15 else 0
+            for c in range(lead, cols - trail):
+                cells[c].text = f"r{r}c{c} " + "lorem ipsum " * rng.randint(0, 3)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _time(fn, payload, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        doc = Document(io.BytesIO(payload))
+        started = time.perf_counter()
+        fn(doc)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--tables", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the current implementation")
+    args = parser.parse_args()
+
+    payload = build_document(args.rows, args.cols, args.tables)
+    print(f"{args.tables} table(s) x {args.rows} rows x {args.cols} cols, best of {args.repeat}")
+    current = _time(process_docx_tables, payload, args.repeat)
+    print(f"  process_docx_tables        {current * 1000:9.1f} ms")
+    if not args.skip_legacy:
+        legacy = _time(legacy_process_docx_tables, payload, args.repeat)
+        print(f"  legacy_process_docx_tables {legacy * 1000:9.1f} ms  ({legacy / current:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+from docx import Document
+from docx.oxml.ns import qn
+
+from app.helper.doc_format import process_docx_tables
+
+
+def _row_layout(row):
+    """[(gridSpan, vMerge, text), ...] straight from the row's <w:tc> elements."""
+    layout = []
+    for tc in row._tr.iterchildren(qn('w:tc')):
+        tcPr = tc.tcPr
+        layout.append((tc.grid_span, tcPr.vMerge_val if tcPr is not None else None, "".join(t.text or "" for t in tc.iter(qn('w:t'))).strip()))
+    return layout
+
+
+def test_empty_vmerge_restart_is_not_absorbed_into_leading_empty_cells():
+    doc = Document()
+    table = doc.add_table(rows=2, cols=3)
+    table.cell(0, 0).merge(table.cell(1, 0))  # empty vertical merge in the first column
+    table.cell(0, 2).text = "a"
+    table.cell(1, 1).text = "b"
+    table.cell(1, 2).text = "c"
+
+    process_docx_tables(doc)
+
+    assert _row_layout(table.rows[0]) == [(1, "restart", ""), (1, None, ""), (1, None, "a")]
+    assert _row_layout(table.rows[1]) == [(1, "continue", ""), (1, None, "b"), (1, None, "c")]
+
+
+def test_trailing_empty_cells_do_not_widen_a_vertical_merge():
+    doc = Document()
+    table = doc.add_table(rows=2, cols=4)
+    table.cell(0, 0).text = "a"
+    table.cell(0, 1).merge(table.cell(1, 1))
+    table.cell(1, 0).text = "b"
+    table.cell(1, 2).text = "c"
+
+    process_docx_tables(doc)
+
+    # The merged column keeps its width; the empty cells after it collapse into one
+    assert _row_layout(table.rows[0]) == [(1, None, "a"), (1, "restart", ""), (2, None, "")]
+    assert _row_layout(table.rows[1]) == [(1, None, "b"), (1, "continue", ""), (2, None, "c")]
+
+
+def test_trailing_empty_cells_are_absorbed_by_last_filled_cell():
+    doc = Document()
+    table = doc.add_table(rows=1, cols=4)
+    table.cell(0, 1).text = "a"
+
+    process_docx_tables(doc)
+
+    assert _row_layout(table.rows[0]) == [(1, None, ""), (3, None, "a")]
@@ -0,0 +1,97 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from app.core.config import settings
+from app.helper import fake_drive, google_docs
+
+CHUNK = 256 * 1024
+
+
+class _Coin:
+    """Stands in for fake_drive's ``random``: counts data chunk PUTs and fails the chosen ones."""
+
+    def __init__(self, fail_on=()):
+        self.calls = 0
+        self.fail_on = set(fail_on)
+
+    def random(self):
+        self.calls += 1
+        return 0.0 if self.calls in self.fail_on else 1.0
+
+
+@pytest.fixture(scope="module")
+def drive_endpoint():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(fake_drive.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "fake Drive did not start"
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(5)
+
+
+@pytest.fixture
+def drive(drive_endpoint, monkeypatch):
+    monkeypatch.setattr(settings, "DRIVE_API_ENDPOINT", drive_endpoint)
+    monkeypatch.setattr(settings, "DRIVE_UPLOAD_CHUNK_SIZE", CHUNK)
+    monkeypatch.setattr(settings, "DRIVE_UPLOAD_RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(settings, "FAKE_DRIVE_FAILURE_RATE", 0.5)
+    # Fresh credentials and per-thread client, built against the fake endpoint
+    monkeypatch.setattr(google_docs, "_creds", None)
+    monkeypatch.setattr(google_docs, "_local", threading.local())
+    coin = _Coin()
+    monkeypatch.setattr(fake_drive, "random", coin)
+    return coin
+
+
+def _stored(link):
+    file_id = link.rsplit("/", 1)[1]
+    return file_id, fake_drive._files[file_id]
+
+
+def test_upload_is_sent_in_chunks(drive):
+    data = os.urandom(2 * CHUNK + 1000)
+
+    link = google_docs.upload_docx_as_gdoc(data, "Chunked", folder_id="folder")
+
+    file_id, stored = _stored(link)
+    assert drive.calls == 3
+    assert stored["data"] == data
+    assert stored["metadata"] == {"name": "Chunked", "mimeType": google_docs.GDOC_MIME, "parents": ["folder"]}
+    assert link.endswith(f"/drive/v3/files/{file_id}")
+
+
+def test_upload_resumes_after_a_failed_chunk(drive):
+    drive.fail_on = {2}
+    data = os.urandom(3 * CHUNK)
+
+    link = google_docs.upload_docx_as_gdoc(data, "Resumed")
+
+    _, stored = _stored(link)
+    # Only the failed chunk is sent again; the first one is not re-uploaded
+    assert drive.calls == 4
+    assert stored["data"] == data
+
+
+def test_upload_gives_up_after_max_retries(drive, monkeypatch):
+    monkeypatch.setattr(settings, "DRIVE_UPLOAD_MAX_RETRIES", 2)
+    drive.fail_on = set(range(1, 100))
+    files_before = len(fake_drive._files)
+
+    with pytest.raises(google_docs.HttpError) as exc_info:
+        google_docs.upload_docx_as_gdoc(os.urandom(CHUNK), "Broken")
+
+    assert exc_info.value.resp.status == 503
+    assert drive.calls == 3
+    assert len(fake_drive._files) == files_before
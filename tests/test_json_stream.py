@@ -0,0 +1,52 @@
+import json
+
+from app.helper.json_stream import ComponentStreamParser
+
+PAGE = {
+    "page_title": "Home {draft}",
+    "components": [
+        {"type": "hero", "properties": {"title": "Say \"hi\" {now}", "items": ["[a]", "b}"]}},
+        {"type": "cards", "properties": {"description": "back\\slash } ]"}},
+        {"type": "footer", "properties": {}},
+    ],
+    "metadata": {"components": [{"type": "not-a-component"}]},
+}
+
+
+def _feed(parser, text, size):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return completed
+
+
+def test_every_chunk_size_yields_the_same_components():
+    text = json.dumps(PAGE)
+    for size in (1, 2, 3, 7, 64, len(text)):
+        parser = ComponentStreamParser()
+        assert _feed(parser, text, size) == PAGE["components"], size
+        assert parser.emitted == 3
+        assert parser.page_title == "Home {draft}"
+        assert parser.done
+        assert json.loads(parser.text) == PAGE
+
+
+def test_code_fences_and_leading_prose_are_skipped():
+    text = "Here is the JSON:\n```json\n" + json.dumps(PAGE, indent=2) + "\n```\n"
+    parser = ComponentStreamParser()
+    assert _feed(parser, text, 5) == PAGE["components"]
+    assert parser.text == text
+
+
+def test_braces_and_quotes_inside_strings_do_not_end_a_component():
+    parser = ComponentStreamParser()
+    first = parser.feed('{"components": [{"type": "hero", "properties": {"title": "a } \\" {"')
+    assert first == []
+    rest = parser.feed('}}, {"type": "x"}]}')
+    assert rest == [{"type": "hero", "properties": {"title": 'a } " {'}}, {"type": "x"}]
+
+
+def test_a_nested_components_key_is_not_mistaken_for_the_top_level_array():
+    parser = ComponentStreamParser()
+    text = json.dumps({"layout": {"components": [{"type": "inner"}]}, "components": [{"type": "outer"}]})
+    assert _feed(parser, text, 4) == [{"type": "outer"}]
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.helper.singleflight import SingleFlight
+
+
+def test_concurrent_callers_join_one_call():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "done"
+
+        callers = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers)
+        return calls, results, "k" in flight
+
+    calls, results, still_inflight = asyncio.run(main())
+    assert calls == 1
+    assert results == ["done"] * 3
+    assert not still_inflight
+
+
+def test_leader_cancel_leaves_the_call_running_for_other_waiters():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_call_is_cancelled_when_all_waiters_leave_and_a_new_caller_starts_fresh():
+    async def main():
+        flight = SingleFlight()
+        started = []
+        cancelled = asyncio.Event()
+
+        async def hanging():
+            started.append("hanging")
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def quick():
+            started.append("quick")
+            return "fresh"
+
+        waiters = [asyncio.create_task(flight.do("k", hanging)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        gone = "k" not in flight
+        # Arrives before the cancellation has reached the shared task
+        result = await flight.do("k", quick)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return gone, result, started
+
+    gone, result, started = asyncio.run(main())
+    assert gone
+    assert result == "fresh"
+    assert started == ["hanging", "quick"]